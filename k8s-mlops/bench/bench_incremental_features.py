@@ -0,0 +1,112 @@
+"""
+增量特征处理基准测试：每次重训练全部重新计算 vs 只处理新增/修改的评论。
+
+在临时的 SQLite 数据库中写入 N 条（默认10万）合成评论，先用 train_pre_csv 的增量模式建立特征库，
+再追加 --new-fraction 比例的新评论并修改、删除少量评论，分别输出：
+增量模式处理这次变化的耗时，以及对当前全部评论重新计算（与流水线模式相同的步骤）的耗时，
+并检查两者得到的情感分数一致。为单独体现特征库的效果，关闭分词缓存。
+
+用法：
+    python bench/bench_incremental_features.py
+    python bench/bench_incremental_features.py --rows 1000000 --new-fraction 0.01
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench_preprocess_pipeline import (
+    ADVERB_WORDS, NEGATION_WORDS, PLAIN_WORDS, SENTIMENT_WORDS, STOPWORDS, generate_comments, write_dictionaries,
+)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def insert_comments(conn, comments, first_time):
+    conn.executemany(
+        "INSERT INTO dataset (text, label, source, create_time) VALUES (?, ?, 0, ?)",
+        [(text, str(label), first_time + i) for i, (text, label) in enumerate(zip(comments["reply"], comments["is_troll"]))],
+    )
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量特征处理与全部重新计算的耗时对比")
+    parser.add_argument("--rows", type=int, default=100000, help="初始评论条数")
+    parser.add_argument("--new-fraction", type=float, default=0.01, help="新增评论占初始评论的比例")
+    parser.add_argument("--changed", type=int, default=100, help="修改和删除的评论条数（各一半）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "dataset.sqlite")
+        os.environ.update({
+            "BASE_PATH": tmp,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "TRACKING_URL": f"file://{tmp}/mlruns",
+            "PREPROCESS_INCREMENTAL": "1",
+            "SEGMENT_CACHE": "0",
+        })
+        import jieba
+        import train_pre_csv as tp
+        from comment_store import read_comments
+
+        paths = write_dictionaries(tmp)
+        # 把合成词加入 jieba 词典，使分词结果与生成时的词一致
+        jieba.initialize()
+        for word in PLAIN_WORDS + list(SENTIMENT_WORDS) + NEGATION_WORDS + list(ADVERB_WORDS) + STOPWORDS:
+            jieba.add_word(word, freq=1000000)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE dataset (id INTEGER PRIMARY KEY, text TEXT NOT NULL, label TEXT NOT NULL, "
+            "source INTEGER, create_time BIGINT)"
+        )
+        insert_comments(conn, generate_comments(args.rows), 1700000000)
+        output_path = os.path.join(tmp, "comments_cleaned.parquet")
+        run_args = (output_path, paths["stopwords"], paths["sen"], paths["neg"], paths["adv"], paths["emoji"])
+
+        begin = time.perf_counter()
+        tp.run_incremental(*run_args)
+        print(f"initial build of the feature store: {time.perf_counter() - begin:.1f}s")
+
+        # 新增、修改、删除评论；修改数据时会更新 create_time
+        insert_comments(conn, generate_comments(int(args.rows * args.new_fraction), seed=7), 1800000000)
+        half = args.changed // 2
+        updated = generate_comments(half, seed=9)["reply"]
+        conn.executemany(
+            "UPDATE dataset SET text = ?, create_time = ? WHERE id = ?",
+            [(text, 1900000000, 10 + 2 * i) for i, text in enumerate(updated)],
+        )
+        conn.executemany("DELETE FROM dataset WHERE id = ?", [(11 + 2 * i,) for i in range(half)])
+        conn.commit()
+
+        begin = time.perf_counter()
+        tp.run_incremental(*run_args)
+        incremental_seconds = time.perf_counter() - begin
+        incremental = read_comments(output_path)
+
+        begin = time.perf_counter()
+        full = tp.filter_comments(pd.read_sql("SELECT * FROM dataset ORDER BY id", f"sqlite:///{db_path}"))
+        full = tp.preprocess_comments(
+            full.reset_index(drop=True),
+            tp.load_stopwords(paths["stopwords"]),
+            *tp.load_sentiment_dictionaries(paths["sen"], paths["neg"], paths["adv"]),
+            tp.load_emoji_scores(paths["emoji"]),
+        )
+        full_seconds = time.perf_counter() - begin
+
+        print(f"incremental retrain: {incremental_seconds:.1f}s, full recompute: {full_seconds:.1f}s "
+              f"({full_seconds / incremental_seconds:.1f}x)")
+        assert incremental["id"].tolist() == full["id"].tolist()
+        for column in ("t-z-score", "e-z-score", "senti-z-score"):
+            diff = np.nanmax(np.abs(incremental[column].to_numpy() - full[column].to_numpy()))
+            print(f"max |incremental - full| {column}: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+预测路径基准测试：mlflow.pyfunc 包装 vs 原生 sklearn 估计器 vs 紧凑推理格式。
+
+在临时的本地 MLflow 存储中记录一个与 train_svm 相同结构的 GridSearchCV(SVC) 模型，
+分别用 mlflow.pyfunc.load_model 和 mlflow.sklearn.load_model 加载，对 /predict 的典型输入
+（单条文本的 TF-IDF CSR 矩阵）重复调用 predict，输出每次调用的平均耗时。
+另外对比从原始文本开始的 向量化+预测：sklearn 向量化器+估计器 与 CompactModel。
+
+用法：
+    python bench/bench_predict_paths.py --calls 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import mlflow
+import mlflow.sklearn
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import GridSearchCV
+from sklearn.svm import SVC
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from compact_model import CompactModel, export_compact_model
+
+
+def build_model(n_samples=2000, seed=42, kernel="linear"):
+    """生成随机“评论”并训练一个小规模的 GridSearchCV(SVC)，结构与 train_svm 一致"""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f"w{i}" for i in range(3000)]
+    texts = [" ".join(rng.choice(vocabulary, size=rng.integers(3, 20))) for _ in range(n_samples)]
+    labels = rng.integers(0, 2, size=n_samples)
+    vectorizer = TfidfVectorizer(max_features=5000)
+    X = vectorizer.fit_transform(texts)
+    clf = GridSearchCV(SVC(class_weight="balanced"), {"kernel": [kernel], "C": [1]}, cv=2)
+    clf.fit(X, labels)
+    return vectorizer, clf, texts
+
+
+def time_calls(fn, inputs, calls):
+    # 先调用几次预热
+    for x in inputs[:10]:
+        fn(x)
+    begin = time.perf_counter()
+    for i in range(calls):
+        fn(inputs[i % len(inputs)])
+    return (time.perf_counter() - begin) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyfunc、原生 sklearn 与紧凑格式预测路径的单次调用开销对比")
+    parser.add_argument("--calls", type=int, default=2000, help="每条路径的预测调用次数")
+    parser.add_argument("--kernel", default="linear", choices=["linear", "rbf"], help="SVC 核函数")
+    args = parser.parse_args()
+
+    vectorizer, clf, texts = build_model(kernel=args.kernel)
+    inputs = [vectorizer.transform([text]) for text in texts[:200]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mlflow.set_tracking_uri(f"sqlite:///{tmp}/mlflow.db")
+        experiment_id = mlflow.create_experiment("bench", artifact_location=f"file://{tmp}/artifacts")
+        with mlflow.start_run(experiment_id=experiment_id):
+            mlflow.sklearn.log_model(clf, "model")
+            model_uri = f"runs:/{mlflow.active_run().info.run_id}/model"
+
+        pyfunc_model = mlflow.pyfunc.load_model(model_uri)
+        sklearn_model = mlflow.sklearn.load_model(model_uri)
+        export_compact_model(sklearn_model, vectorizer, f"{tmp}/compact")
+        compact_model = CompactModel(f"{tmp}/compact")
+
+        results = {
+            "pyfunc predict": time_calls(pyfunc_model.predict, inputs, args.calls),
+            "sklearn predict": time_calls(sklearn_model.predict, inputs, args.calls),
+            "sklearn decision_function": time_calls(sklearn_model.decision_function, inputs, args.calls),
+            "text -> sklearn predict": time_calls(
+                lambda text: sklearn_model.predict(vectorizer.transform([text])), texts[:200], args.calls),
+            "text -> compact predict": time_calls(lambda text: compact_model.predict([text]), texts[:200], args.calls),
+        }
+
+    baseline = results["pyfunc predict"]
+    print(f"{'path':<28}{'us/call':>12}{'vs pyfunc':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<28}{seconds * 1e6:>12.1f}{baseline / seconds:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+预处理流水线基准测试：逐步读写 CSV vs 内存流水线 + Parquet。
+
+生成 N 条（默认100万）合成评论以及小规模的停用词、情感、否定词、副词和emoji词典，
+分别用 train_pre_csv 的逐步模式（每个步骤 read_csv + to_csv 同一个文件）和流水线模式
+（同一个 DataFrame 在内存中经过所有步骤，最后写一次 Parquet）处理，输出两种模式的
+总耗时、文件读写字节数、结果文件大小，以及 train_embed/train_svm 读取所需列的耗时，
+并检查两种模式得到的情感分数一致。
+
+默认输入已经分好词（word_seg 列），只比较分词之后的步骤，避免 jieba 分词的耗时掩盖 I/O 的差异；
+--segment 时从原始文本开始，包含分词步骤。
+
+用法：
+    python bench/bench_preprocess_pipeline.py
+    python bench/bench_preprocess_pipeline.py --rows 200000 --segment
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+# 合成词表：普通词、情感词、否定词、副词和emoji
+PLAIN_WORDS = [f"词{i}" for i in range(5000)]
+SENTIMENT_WORDS = {f"好{i}": (i % 7) - 3.0 for i in range(300)}
+NEGATION_WORDS = ["不", "没有", "别"]
+ADVERB_WORDS = {"很": 1.5, "非常": 2.0, "有点": 0.6}
+EMOJIS = ["😀", "😂", "😡", "😭", "👍", "🙏"]
+STOPWORDS = ["的", "了", "啊"]
+
+
+def write_dictionaries(data_dir):
+    """写出与 BASE_PATH 下同名、同格式的词典文件"""
+    paths = {
+        "stopwords": os.path.join(data_dir, "stopwords.txt"),
+        "sen": os.path.join(data_dir, "BosonNLP_sentiment_score.txt"),
+        "neg": os.path.join(data_dir, "NOT.txt"),
+        "adv": os.path.join(data_dir, "adv_chinese.txt"),
+        "emoji": os.path.join(data_dir, "emoji_data.csv"),
+    }
+    with open(paths["stopwords"], "w", encoding="utf-8") as f:
+        f.write("\n".join(STOPWORDS) + "\n")
+    with open(paths["sen"], "w", encoding="utf-8") as f:
+        f.writelines(f"{word} {score}\n" for word, score in SENTIMENT_WORDS.items())
+    with open(paths["neg"], "w", encoding="utf-8") as f:
+        f.writelines(f"{word},1\n" for word in NEGATION_WORDS)
+    with open(paths["adv"], "w", encoding="utf-8") as f:
+        f.writelines(f"{word},{weight}\n" for word, weight in ADVERB_WORDS.items())
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "Emoji": EMOJIS,
+        "Negative": rng.integers(1, 100, len(EMOJIS)),
+        "Neutral": rng.integers(1, 100, len(EMOJIS)),
+        "Positive": rng.integers(1, 100, len(EMOJIS)),
+    }).to_csv(paths["emoji"], index=False)
+    return paths
+
+
+def generate_comments(rows, seed=42):
+    """
+    生成与 load_clean_comments 返回结构相同的评论数据，另外附带按生成时的词切分的 word_seg 列。
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(
+        PLAIN_WORDS + list(SENTIMENT_WORDS) + NEGATION_WORDS + list(ADVERB_WORDS) + EMOJIS + STOPWORDS
+    )
+    # 普通词占大多数，其余各类词各占一小部分
+    weights = np.concatenate([
+        np.full(len(PLAIN_WORDS), 0.7 / len(PLAIN_WORDS)),
+        np.full(len(SENTIMENT_WORDS), 0.15 / len(SENTIMENT_WORDS)),
+        np.full(len(NEGATION_WORDS), 0.03 / len(NEGATION_WORDS)),
+        np.full(len(ADVERB_WORDS), 0.04 / len(ADVERB_WORDS)),
+        np.full(len(EMOJIS), 0.03 / len(EMOJIS)),
+        np.full(len(STOPWORDS), 0.05 / len(STOPWORDS)),
+    ])
+    lengths = rng.integers(2, 9, rows)
+    words = rng.choice(vocabulary, size=lengths.sum(), p=weights / weights.sum())
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    segments = [words[offsets[i]:offsets[i + 1]] for i in range(rows)]
+    stopwords = set(STOPWORDS)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "reply": ["".join(segment) for segment in segments],
+        "is_troll": rng.integers(0, 2, rows),
+        "source": np.zeros(rows, dtype=np.int64),
+        "create_time": np.full(rows, 1700000000, dtype=np.int64),
+        "word_seg": [" ".join(word for word in segment if word not in stopwords) for segment in segments],
+    })
+
+
+class FileIO:
+    """记录逐步模式中每个步骤读写的文件字节数"""
+
+    def __init__(self, path):
+        self.path = path
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def step(self, fn, *args):
+        self.bytes_read += os.path.getsize(self.path)
+        fn(self.path, *args)
+        self.bytes_written += os.path.getsize(self.path)
+
+
+def run_steps(tp, comments, paths, csv_path, segment):
+    """逐步模式：与 train_pre_csv.run_steps 相同的步骤，起点为 get_clean_comments 写出的CSV"""
+    io = FileIO(csv_path)
+    begin = time.perf_counter()
+    tp.write_comments(comments, csv_path)
+    io.bytes_written += os.path.getsize(csv_path)
+    if segment:
+        io.step(tp.seg_rmStpw, paths["stopwords"])
+    io.step(tp.calculate_sentiment_score_and_normalize, paths["sen"], paths["neg"], paths["adv"])
+    io.step(tp.t_normalize_sentiment_scores)
+    io.step(tp.calculate_emoji_sentiment_scores, paths["emoji"])
+    io.step(tp.normalize_emoji_scores)
+    io.step(tp.calculate_and_final_sentiment_score)
+    io.step(tp.normalize_senti_scores)
+    return time.perf_counter() - begin, io.bytes_read, io.bytes_written
+
+
+def run_pipeline(tp, comments, paths, parquet_path, segment):
+    """流水线模式：与 train_pre_csv.run_pipeline 相同，数据来自内存中的 DataFrame"""
+    begin = time.perf_counter()
+    stopwords = tp.load_stopwords(paths["stopwords"])
+    dictionaries = tp.load_sentiment_dictionaries(paths["sen"], paths["neg"], paths["adv"])
+    emoji_scores = tp.load_emoji_scores(paths["emoji"])
+    if segment:
+        df = tp.preprocess_comments(comments, stopwords, *dictionaries, emoji_scores)
+    else:
+        # 输入已分好词，跳过 preprocess_comments 中的分词阶段
+        df = comments
+        tp.add_text_sentiment_scores(df, *dictionaries)
+        tp.add_zscore(df, "t-score", "t-z-score")
+        tp.add_emoji_sentiment_scores(df, emoji_scores)
+        tp.add_zscore(df, "e-score", "e-z-score")
+        tp.add_final_sentiment_scores(df)
+        tp.add_zscore(df, "senti-score", "senti-z-score")
+    compute_seconds = time.perf_counter() - begin
+    tp.write_comments(df, parquet_path)
+    return time.perf_counter() - begin, compute_seconds, os.path.getsize(parquet_path)
+
+
+def time_read(read_comments, path, columns, repeat=3):
+    """下游读取所需列的最短耗时"""
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        read_comments(path, columns=columns)
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="train_pre_csv 逐步 CSV 模式与内存流水线模式的耗时和 I/O 对比")
+    parser.add_argument("--rows", type=int, default=1000000, help="评论条数")
+    parser.add_argument("--segment", action="store_true", help="从原始文本开始，包含 jieba 分词步骤")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # train_pre_csv 在导入时读取这些环境变量，基准测试不会访问数据库和 MLflow
+        os.environ.setdefault("BASE_PATH", tmp)
+        os.environ.setdefault("DATABASE_URL", "sqlite://")
+        os.environ.setdefault("TRACKING_URL", f"file://{tmp}/mlruns")
+        import train_pre_csv as tp
+        from comment_store import read_comments
+
+        paths = write_dictionaries(tmp)
+        begin = time.perf_counter()
+        comments = generate_comments(args.rows)
+        if args.segment:
+            comments = comments.drop(columns=["word_seg"])
+            # 把合成词加入 jieba 词典，使分词结果与生成时的词一致；先加载词典，不计入两种模式的耗时
+            import jieba
+            jieba.initialize()
+            for word in PLAIN_WORDS + list(SENTIMENT_WORDS) + NEGATION_WORDS + list(ADVERB_WORDS) + STOPWORDS:
+                jieba.add_word(word, freq=1000000)
+        print(f"Generated {args.rows} comments in {time.perf_counter() - begin:.1f}s")
+
+        csv_path = os.path.join(tmp, "steps", "comments_cleaned.csv")
+        parquet_path = os.path.join(tmp, "pipeline", "comments_cleaned.parquet")
+        os.makedirs(os.path.dirname(csv_path))
+        os.makedirs(os.path.dirname(parquet_path))
+
+        steps_seconds, bytes_read, bytes_written = run_steps(tp, comments.copy(), paths, csv_path, args.segment)
+        pipeline_seconds, compute_seconds, parquet_bytes = run_pipeline(
+            tp, comments.copy(), paths, parquet_path, args.segment
+        )
+
+        mb = 1024 * 1024
+        print(f"{'mode':<10} {'seconds':>9} {'read MB':>9} {'written MB':>11} {'output MB':>10}")
+        print(f"{'steps':<10} {steps_seconds:9.1f} {bytes_read / mb:9.1f} {bytes_written / mb:11.1f} "
+              f"{os.path.getsize(csv_path) / mb:10.1f}")
+        print(f"{'pipeline':<10} {pipeline_seconds:9.1f} {0:9.1f} {parquet_bytes / mb:11.1f} {parquet_bytes / mb:10.1f}")
+        print(f"pipeline compute {compute_seconds:.1f}s, write {pipeline_seconds - compute_seconds:.1f}s; "
+              f"steps mode spent about {steps_seconds - compute_seconds:.1f}s on CSV reads/writes")
+
+        for columns in (["reply"], ["reply", "is_troll"], ["senti-z-score"]):
+            csv_seconds = time_read(read_comments, csv_path, columns)
+            parquet_seconds = time_read(read_comments, parquet_path, columns)
+            print(f"read {','.join(columns):<16} csv {csv_seconds:6.2f}s  parquet {parquet_seconds:6.2f}s")
+
+        steps_df = read_comments(csv_path)
+        pipeline_df = read_comments(parquet_path)
+        for column in ("t-score", "e-score", "senti-z-score"):
+            diff = np.nanmax(np.abs(steps_df[column].to_numpy() - pipeline_df[column].to_numpy()))
+            print(f"max |steps - pipeline| {column}: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
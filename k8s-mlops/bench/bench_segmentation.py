@@ -0,0 +1,83 @@
+"""
+jieba分词基准测试：单进程 vs 进程池 vs 分词缓存。
+
+生成 N 条（默认20万）由常用汉字随机组成的评论，分别用 segmentation.segment_texts 的
+单进程方式和不同进程数的进程池分词，输出耗时、加速比，并检查结果与单进程完全一致。
+之后用 SegmentationCache 模拟重训练：第一次全部未命中，第二次追加 --new-fraction 比例的
+新评论，只有新评论需要分词。
+
+用法：
+    python bench/bench_segmentation.py
+    python bench/bench_segmentation.py --rows 1000000 --workers 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import jieba
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from segmentation import SegmentationCache, segment_texts, segment_texts_cached
+
+STOPWORDS = {"的", "了", "是", "我", "你", "啊"}
+
+
+def generate_texts(rows, seed=42):
+    """由前3000个常用汉字区段中的字随机组成长度3到40的评论"""
+    rng = np.random.default_rng(seed)
+    chars = np.array([chr(0x4E00 + i) for i in range(3000)] + list(STOPWORDS))
+    lengths = rng.integers(3, 41, rows)
+    flat = rng.choice(chars, size=lengths.sum())
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return ["".join(flat[offsets[i]:offsets[i + 1]]) for i in range(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="单进程与多进程jieba分词的耗时对比")
+    parser.add_argument("--rows", type=int, default=200000, help="评论条数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1], help="进程池的进程数")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每个任务包含的评论数")
+    parser.add_argument("--new-fraction", type=float, default=0.05, help="第二次运行时新增评论占原有评论的比例")
+    args = parser.parse_args()
+
+    texts = generate_texts(args.rows)
+    # 先加载词典，不计入各方式的耗时
+    jieba.initialize()
+
+    begin = time.perf_counter()
+    expected = segment_texts(texts, STOPWORDS, workers=1)
+    serial_seconds = time.perf_counter() - begin
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>10} {'speedup':>8}")
+    print(f"{1:>8} {serial_seconds:9.1f} {args.rows / serial_seconds:10.0f} {1:8.2f}")
+
+    for workers in sorted(set(args.workers)):
+        if workers <= 1:
+            continue
+        begin = time.perf_counter()
+        segmented = segment_texts(
+            texts, STOPWORDS, workers=workers, chunk_size=args.chunk_size, min_parallel_rows=0
+        )
+        seconds = time.perf_counter() - begin
+        assert segmented == expected, f"workers={workers} output differs from the serial result"
+        print(f"{workers:>8} {seconds:9.1f} {args.rows / seconds:10.0f} {serial_seconds / seconds:8.2f}")
+
+    new_texts = generate_texts(int(args.rows * args.new_fraction), seed=7)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SegmentationCache(os.path.join(tmp, "segmentation.sqlite"), "bench")
+        for name, batch in (("cache cold", texts), ("cache + new", texts + new_texts)):
+            hits, misses = cache.hits, cache.misses
+            begin = time.perf_counter()
+            segmented = segment_texts_cached(batch, STOPWORDS, cache)
+            seconds = time.perf_counter() - begin
+            assert segmented[:len(expected)] == expected, f"{name} output differs from the serial result"
+            print(f"{name:<12} {seconds:6.1f}s  {len(batch)} rows, "
+                  f"{cache.hits - hits} hits, {cache.misses - misses} misses")
+        print(f"cache file {os.path.getsize(cache.path) / 1024 / 1024:.1f} MB")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
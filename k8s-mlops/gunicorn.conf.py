@@ -0,0 +1,57 @@
+# gunicorn 生产环境配置
+# 启动：gunicorn -c gunicorn.conf.py
+import gc
+import os
+import shutil
+
+wsgi_app = "wsgi:app"
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+# 每个 worker 是一个进程，进程内用线程处理并发请求。
+# 认证缓存是每个 worker 各自的，修改、删除用户后其他 worker 通过 users.token_version 发现变化，
+# 最多延迟 AUTH_VERSION_TTL（默认5）秒才生效
+workers = int(os.environ.get("WEB_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("WEB_THREADS", "4"))
+
+# 在 master 中导入应用并完成预热，模型只加载一次，worker 以写时复制的方式共享内存
+preload_app = True
+
+# 单个请求的超时时间，以及收到 SIGTERM 后等待进行中请求完成的时间
+timeout = int(os.environ.get("WEB_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# 多个 worker 的 Prometheus 指标写入共享目录，由 /metrics 汇总；必须在导入应用之前设置，
+# 每次启动时清空，避免上次运行留下的数据
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+accesslog = "-"
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    # 把预加载的对象移出垃圾回收的跟踪范围，避免 GC 写入对象头导致共享的内存页被复制
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import dataset
+
+    dataset.start_background_tasks()
+
+
+def worker_exit(server, worker):
+    import dataset
+
+    dataset.shutdown()
+
+
+def child_exit(server, worker):
+    # 已退出 worker 的 livesum 类指标不再计入
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,44 @@
+"""初始数据表 users 和 dataset
+
+之前的部署由 db.create_all() 建表，表已存在时跳过，作为迁移的基线
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 只生成 SQL（--sql）时无法查询数据库，按空库处理
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("username", sa.String(50), nullable=False, unique=True),
+            sa.Column("password", sa.String(255), nullable=False),
+            sa.Column("role", sa.String(50), nullable=False),
+        )
+    if "dataset" not in existing:
+        op.create_table(
+            "dataset",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("text", sa.String, nullable=False),
+            sa.Column("label", sa.String, nullable=False),
+            sa.Column("source", sa.Integer),
+            sa.Column("create_time", sa.BigInteger),
+        )
+
+
+def downgrade():
+    op.drop_table("dataset")
+    op.drop_table("users")
@@ -0,0 +1,36 @@
+"""dataset 表的 label、create_time 以及 (label, create_time) 索引
+
+label 索引用于 /datasets/search 的标签过滤，create_time 和组合索引用于
+训练数据按时间增量抽取（“某时间之后的数据”、“某标签某时间之后的数据”）
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_dataset_label", ["label"]),
+    ("ix_dataset_create_time", ["create_time"]),
+    ("ix_dataset_label_create_time", ["label", "create_time"]),
+]
+
+
+def upgrade():
+    # PostgreSQL 上使用 CONCURRENTLY 建索引，不阻塞线上写入，需要在事务外执行
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, "dataset", columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="dataset", if_exists=True, postgresql_concurrently=True)
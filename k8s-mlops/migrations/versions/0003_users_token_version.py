@@ -0,0 +1,35 @@
+"""users 表增加 token_version 列
+
+修改密码、角色时加1，令牌和认证缓存中记录签发时的版本，与表中的值不一致即失效，
+所有 worker 和副本看到的是同一个值
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 由 db.create_all() 建表的部署可能已经有该列；只生成 SQL（--sql）时按没有处理
+    existing = set() if op.get_context().as_sql else {
+        column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")
+    }
+    if "token_version" not in existing:
+        op.add_column(
+            "users",
+            sa.Column("token_version", sa.Integer, nullable=False, server_default="0"),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("token_version")
@@ -0,0 +1,146 @@
+import os
+import time
+from collections import OrderedDict, deque
+from threading import Condition, Event, Lock, Thread
+
+
+class _PendingItem:
+    """队列中等待处理的单个请求"""
+
+    __slots__ = ("item", "enqueue_time", "event", "result", "error")
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueue_time = time.monotonic()
+        self.event = Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    服务端微批处理（动态批处理）。
+
+    并发调用 submit 的请求按 key 分组排队，后台线程在等待窗口到期或攒满
+    max_batch_size 条后，把同一 key 的请求合并为一次 handler 调用，
+    再把结果按顺序分发回各个调用方。后台线程空闲且只有一个请求在排队时（没有并发流量）
+    立即处理，不等待窗口，单个请求只多一次线程切换。所有 key 共用一个后台线程，handler 耗时过长会阻塞
+    其他 key 的批次，加载模型等可能很慢的操作应在调用 submit 之前完成。
+
+    Args:
+        handler (callable): handler(key, items) -> 与 items 等长、顺序一致的结果列表。
+        max_batch_size (int): 单批最多合并的请求数。
+        max_wait (float): 一批中最早的请求最多等待的时间（秒）。
+    """
+
+    def __init__(self, handler, max_batch_size=32, max_wait=0.002):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queues = OrderedDict()
+        self._cond = Condition()
+        self._stats_lock = Lock()
+        self._stats = {
+            "batches": 0,
+            "items": 0,
+            "max_batch_size": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            # 批大小分布，key 为批大小上界
+            "batch_size_buckets": OrderedDict((b, 0) for b in (1, 2, 4, 8, 16, 32, 64, 128, float("inf"))),
+        }
+        self._worker = None
+        self._worker_pid = None
+        # 后台线程是否正在执行 handler，由 _cond 保护
+        self._busy = False
+
+    def _ensure_worker(self):
+        # 后台线程在第一次提交时启动；预加载后 fork 出的子进程中没有父进程的线程，需要重新启动
+        if self._worker_pid != os.getpid():
+            self._worker_pid = os.getpid()
+            self._worker = Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, key, item):
+        """提交单个请求并阻塞等待其所在批次的处理结果"""
+        pending = _PendingItem(item)
+        with self._cond:
+            self._ensure_worker()
+            self._queues.setdefault(key, deque()).append(pending)
+            self._cond.notify()
+        pending.event.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        """返回批大小和排队等待时间的统计信息"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["batch_size_buckets"] = {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in self._stats["batch_size_buckets"].items()
+            }
+        with self._cond:
+            stats["queued"] = sum(len(q) for q in self._queues.values())
+        stats["avg_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _next_batch(self):
+        """等待直到某个 key 的批次可以处理，返回 (key, 请求列表)"""
+        with self._cond:
+            while True:
+                if not self._queues:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                if not self._busy and len(self._queues) == 1:
+                    key, queue = next(iter(self._queues.items()))
+                    if len(queue) == 1:
+                        # 没有并发请求，等待窗口只会增加延迟
+                        del self._queues[key]
+                        self._busy = True
+                        return key, [queue.popleft()]
+                # 优先处理已满或最早请求已到期的队列
+                deadline = None
+                for key, queue in self._queues.items():
+                    expire = queue[0].enqueue_time + self.max_wait
+                    if len(queue) >= self.max_batch_size or expire <= now:
+                        batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch_size))]
+                        if not queue:
+                            del self._queues[key]
+                        self._busy = True
+                        return key, batch
+                    deadline = expire if deadline is None else min(deadline, expire)
+                self._cond.wait(deadline - now)
+
+    def _record(self, batch, start):
+        waits = [start - pending.enqueue_time for pending in batch]
+        with self._stats_lock:
+            stats = self._stats
+            stats["batches"] += 1
+            stats["items"] += len(batch)
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(batch))
+            stats["queue_wait_seconds_total"] += sum(waits)
+            stats["queue_wait_seconds_max"] = max(stats["queue_wait_seconds_max"], max(waits))
+            for bound in stats["batch_size_buckets"]:
+                if len(batch) <= bound:
+                    stats["batch_size_buckets"][bound] += 1
+                    break
+
+    def _run(self):
+        while True:
+            key, batch = self._next_batch()
+            self._record(batch, time.monotonic())
+            try:
+                results = self.handler(key, [pending.item for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                # 整批失败时，每个调用方都收到同一个异常
+                for pending in batch:
+                    pending.error = e
+            with self._cond:
+                self._busy = False
+            for pending in batch:
+                pending.event.set()
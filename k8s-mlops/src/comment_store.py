@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+
+# 预处理结果（清洗后的评论及分词、情感分数）的存放位置：
+# 流水线模式写入列式的 Parquet 文件，逐步模式沿用 CSV，两者只会存在其中一个
+COMMENTS_DIR = "comment_output"
+COMMENTS_CSV = "comments_cleaned.csv"
+COMMENTS_PARQUET = "comments_cleaned.parquet"
+
+
+def comments_path(base_path):
+    """
+    返回预处理结果文件的路径，Parquet 文件存在时优先使用，否则为 CSV 文件。
+
+    Args:
+        base_path (str): 数据根目录（BASE_PATH）。
+    """
+    parquet_path = os.path.join(base_path, COMMENTS_DIR, COMMENTS_PARQUET)
+    if os.path.exists(parquet_path):
+        return parquet_path
+    return os.path.join(base_path, COMMENTS_DIR, COMMENTS_CSV)
+
+
+def read_comments(path, columns=None):
+    """
+    读取预处理结果，按扩展名区分 Parquet 和 CSV。
+
+    Args:
+        path (str): 文件路径。
+        columns (list): 只读取这些列，None 表示全部列。Parquet 按列存储，只会读取需要的列。
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_comments(df, path):
+    """
+    按扩展名把预处理结果写为 Parquet 或 CSV，并删除另一种格式的旧文件，
+    保证 comments_path 返回的是本次写入的结果。
+    """
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+        stale_path = path[: -len(".parquet")] + ".csv"
+    else:
+        df.to_csv(path, index=False)
+        stale_path = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
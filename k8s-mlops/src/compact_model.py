@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+import scipy.sparse as sp
+
+# 导出格式的版本号，格式变化时递增
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+def term_hash(term):
+    """词项的稳定64位哈希，用于 词项 -> 列号 的查找表"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _binary_classes(estimator):
+    classes = [c.item() if hasattr(c, "item") else c for c in estimator.classes_]
+    if len(classes) != 2:
+        raise ValueError(f"Only binary classifiers can be exported, got {len(classes)} classes")
+    return classes
+
+
+def _dense_row(matrix):
+    """把 coef_/dual_coef_（稀疏或稠密，形状为 (1, n)）转换为一维数组"""
+    if sp.issparse(matrix):
+        matrix = matrix.toarray()
+    return np.asarray(matrix, dtype=np.float64).ravel()
+
+
+def export_compact_model(estimator, vectorizer, output_dir):
+    """
+    把训练好的 SVC 和 TF-IDF 向量化器导出为不依赖 pickle 的推理格式。
+
+    输出目录中的文件：
+        meta.json           分词参数、核函数、类别、截距等元数据
+        vocab_hash.npy      排好序的词项哈希 (uint64)
+        vocab_index.npy     与 vocab_hash 对应的列号 (int32)
+        idf.npy             每一列的 IDF 权重
+        coef.npy            线性核：权重向量
+        sv_data.npy, sv_indices.npy, sv_indptr.npy, sv_sq_norms.npy, dual_coef.npy
+                            rbf 核：CSR 格式的支持向量矩阵、支持向量的平方范数和对偶系数
+
+    Args:
+        estimator: 训练好的二分类 SVC，或 best_estimator_ 为 SVC 的 GridSearchCV。
+        vectorizer: 训练时使用的 TfidfVectorizer。
+        output_dir (str): 输出目录。
+    """
+    estimator = getattr(estimator, "best_estimator_", estimator)
+    if vectorizer.analyzer != "word" or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("Only word analyzers with the default tokenizer and preprocessor can be exported")
+    if estimator.kernel not in ("linear", "rbf"):
+        raise ValueError(f"Unsupported kernel: {estimator.kernel}")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 词表：词项哈希排序后与列号一起保存，推理时用二分查找定位列号
+    terms = list(vectorizer.vocabulary_.items())
+    hashes = np.array([term_hash(term) for term, _ in terms], dtype=np.uint64)
+    columns = np.array([column for _, column in terms], dtype=np.int32)
+    order = np.argsort(hashes)
+    hashes, columns = hashes[order], columns[order]
+    if len(hashes) > 1 and np.any(hashes[1:] == hashes[:-1]):
+        raise ValueError("Hash collision in vocabulary")
+    np.save(os.path.join(output_dir, "vocab_hash.npy"), hashes)
+    np.save(os.path.join(output_dir, "vocab_index.npy"), columns)
+
+    n_features = len(vectorizer.vocabulary_)
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(n_features)
+    np.save(os.path.join(output_dir, "idf.npy"), np.asarray(idf, dtype=np.float64))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "kernel": estimator.kernel,
+        "classes": _binary_classes(estimator),
+        "intercept": float(estimator.intercept_[0]),
+        "n_features": n_features,
+        "lowercase": vectorizer.lowercase,
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "stop_words": sorted(vectorizer.get_stop_words() or []),
+        "binary": vectorizer.binary,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+    }
+
+    if estimator.kernel == "linear":
+        np.save(os.path.join(output_dir, "coef.npy"), _dense_row(estimator.coef_))
+    else:
+        support_vectors = sp.csr_matrix(estimator.support_vectors_, dtype=np.float64)
+        np.save(os.path.join(output_dir, "sv_data.npy"), support_vectors.data)
+        np.save(os.path.join(output_dir, "sv_indices.npy"), support_vectors.indices.astype(np.int32))
+        np.save(os.path.join(output_dir, "sv_indptr.npy"), support_vectors.indptr.astype(np.int64))
+        np.save(os.path.join(output_dir, "sv_sq_norms.npy"),
+                np.asarray(support_vectors.multiply(support_vectors).sum(axis=1), dtype=np.float64).ravel())
+        np.save(os.path.join(output_dir, "dual_coef.npy"), _dense_row(estimator.dual_coef_))
+        # gamma="scale"/"auto" 时实际使用的数值保存在 _gamma 中
+        meta["gamma"] = float(estimator._gamma)
+
+    with open(os.path.join(output_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class CompactModel:
+    """
+    导出格式的轻量推理器，只依赖 numpy/scipy。
+
+    数组以内存映射方式打开，多个进程加载同一份文件时共享页缓存。
+    分词、TF-IDF 加权和归一化与 sklearn 的 TfidfVectorizer 保持一致，
+    predict 返回与原 SVC 相同的类别。
+    """
+
+    def __init__(self, model_dir, mmap_mode="r"):
+        self.model_dir = model_dir
+        with open(os.path.join(model_dir, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format: {self.meta['format_version']}")
+
+        def load(name):
+            return np.load(os.path.join(model_dir, name), mmap_mode=mmap_mode)
+
+        self.vocab_hash = load("vocab_hash.npy")
+        self.vocab_index = load("vocab_index.npy")
+        self.idf = load("idf.npy")
+        self.kernel = self.meta["kernel"]
+        self.classes = np.array(self.meta["classes"])
+        self.intercept = self.meta["intercept"]
+        self.n_features = self.meta["n_features"]
+        self._token_pattern = re.compile(self.meta["token_pattern"])
+        self._stop_words = frozenset(self.meta["stop_words"])
+
+        if self.kernel == "linear":
+            self.coef = load("coef.npy")
+        else:
+            self.support_vectors = sp.csr_matrix(
+                (load("sv_data.npy"), load("sv_indices.npy"), load("sv_indptr.npy")),
+                shape=(len(load("dual_coef.npy")), self.n_features),
+            )
+            self.sv_sq_norms = load("sv_sq_norms.npy")
+            self.dual_coef = load("dual_coef.npy")
+            self.gamma = self.meta["gamma"]
+
+    @property
+    def nbytes(self):
+        """模型数组的总字节数"""
+        arrays = [self.vocab_hash, self.vocab_index, self.idf]
+        if self.kernel == "linear":
+            arrays.append(self.coef)
+        else:
+            arrays += [self.support_vectors.data, self.support_vectors.indices, self.support_vectors.indptr,
+                       self.sv_sq_norms, self.dual_coef]
+        return int(sum(array.nbytes for array in arrays))
+
+    def _terms(self, text):
+        if self.meta["lowercase"]:
+            text = text.lower()
+        tokens = [t for t in self._token_pattern.findall(text) if t not in self._stop_words]
+        low, high = self.meta["ngram_range"]
+        if (low, high) == (1, 1):
+            return tokens
+        terms = tokens if low == 1 else []
+        for n in range(max(low, 2), high + 1):
+            terms += [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return terms
+
+    def transform(self, texts):
+        """把文本转换为 TF-IDF CSR 矩阵，结果与训练时的 TfidfVectorizer 一致"""
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            counts = Counter(self._terms(text))
+            if counts:
+                hashes = np.fromiter((term_hash(term) for term in counts), dtype=np.uint64, count=len(counts))
+                positions = np.searchsorted(self.vocab_hash, hashes)
+                positions[positions >= len(self.vocab_hash)] = 0
+                found = self.vocab_hash[positions] == hashes
+                columns = self.vocab_index[positions[found]]
+                tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[found]
+                if self.meta["binary"]:
+                    tf = np.ones_like(tf)
+                elif self.meta["sublinear_tf"]:
+                    tf = 1 + np.log(tf)
+                values = tf * self.idf[columns]
+                if self.meta["norm"] == "l2":
+                    norm = np.sqrt(np.dot(values, values))
+                    values = values / norm if norm else values
+                elif self.meta["norm"] == "l1":
+                    norm = np.abs(values).sum()
+                    values = values / norm if norm else values
+                data.append(values)
+                indices.append(columns)
+                indptr.append(indptr[-1] + len(columns))
+            else:
+                indptr.append(indptr[-1])
+        return sp.csr_matrix(
+            (np.concatenate(data) if data else np.array([]),
+             np.concatenate(indices) if indices else np.array([], dtype=np.int32),
+             np.array(indptr)),
+            shape=(len(texts), self.n_features),
+        )
+
+    def decision_function(self, texts):
+        """返回每条文本的决策函数值，大于0时预测为第二个类别"""
+        return self.decision_function_transformed(self.transform(texts))
+
+    def decision_function_transformed(self, X):
+        """对 transform 得到的矩阵计算决策函数值"""
+        if self.kernel == "linear":
+            return X @ self.coef + self.intercept
+        # rbf：||sv - x||^2 = ||sv||^2 + ||x||^2 - 2 sv·x
+        x_sq_norms = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+        cross = (X @ self.support_vectors.T).toarray()
+        distances = self.sv_sq_norms[np.newaxis, :] + x_sq_norms[:, np.newaxis] - 2 * cross
+        return np.exp(-self.gamma * distances) @ self.dual_coef + self.intercept
+
+    def predict(self, texts):
+        """返回每条文本的预测类别"""
+        return self.predict_transformed(self.transform(texts))
+
+    def predict_transformed(self, X):
+        """对 transform 得到的矩阵预测类别"""
+        return self.classes[(self.decision_function_transformed(X) > 0).astype(int)]
@@ -1,25 +1,46 @@
 import sys
+import os
 sys.path.append("/root/train/src")
+# 以 python -m src.dataset 或 gunicorn 启动时，保证同目录下的模块可以直接导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, BigInteger
-from threading import Thread
+from sqlalchemy import Column, Integer, String, BigInteger, insert, func, select
+from threading import Thread, Lock
 
 import mlflow
+import mlflow.sklearn
 
 from datetime import datetime
 import time
-import os
+import atexit
+import base64
+import json
+import hashlib
+import hmac
+import secrets
+import shutil
+from collections import OrderedDict, namedtuple
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from joblib import load
-import train_embed
 import train_pre_csv
-import train_svm
+from batcher import MicroBatcher
+from retrain import RetrainScheduler
+from schema import upgrade_schema
+from model_cache import ModelCache
+from compact_model import CompactModel
+from predict_cache import PredictionCache
+from write_behind import WriteBehindWriter
+from db_timing import DBTiming
+from dataset_export import EXPORT_FORMATS, encode_rows
+from ingest import ingest, read_records
+import metrics
 
 from functools import wraps
-from flask_httpauth import HTTPBasicAuth
+from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from flask import g
 
 from flask_cors import CORS, cross_origin
@@ -29,8 +50,16 @@ app = Flask(__name__)
 
 CORS(app)  # 在app上启用全局跨域支持
 
-# 设置HTTP基本认证
-auth = HTTPBasicAuth()
+# 设置认证：支持HTTP基本认证和 /login 签发的 Bearer 令牌
+basic_auth = HTTPBasicAuth()
+token_auth = HTTPTokenAuth(scheme="Bearer")
+auth = MultiAuth(basic_auth, token_auth)
+
+# 令牌签名密钥，多进程或多副本部署时必须通过 SECRET_KEY 配置为相同的值
+app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY") or secrets.token_hex(32)
+# 令牌有效期（秒）
+TOKEN_TTL = int(os.environ.get("TOKEN_TTL", "43200"))
+token_serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="auth-token")
 
 # 设置MLflow跟踪URI，用于模型版本管理
 mlflow.tracking.set_tracking_uri(os.environ["TRACKING_URL"])
@@ -38,8 +67,48 @@ mlflow.tracking.set_tracking_uri(os.environ["TRACKING_URL"])
 # 配置数据库
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# 连接池配置：pre-ping 在取出连接时检测断开的连接，recycle 定期替换长时间存活的连接
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+}
+# SQLite 使用的连接池不支持连接数配置
+if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+    })
 db = SQLAlchemy(app)
 
+# 按接口统计每个请求的 SQL 语句数和数据库耗时，并通过 Server-Timing 响应头返回
+DB_TIMING = DBTiming()
+with app.app_context():
+    DB_TIMING.install(db.engine)
+
+@app.before_request
+def begin_db_timing():
+    metrics.IN_FLIGHT.inc()
+    DB_TIMING.begin()
+
+@app.after_request
+def add_server_timing(response):
+    endpoint = request.endpoint or "unknown"
+    timing = DB_TIMING.end(endpoint)
+    if timing is not None:
+        queries, db_seconds, request_seconds = timing
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={db_seconds * 1000:.2f};desc="{queries} queries", app;dur={request_seconds * 1000:.2f}',
+        )
+        metrics.observe_request(request.method, endpoint, response.status_code, request_seconds, queries, db_seconds)
+    return response
+
+# 请求处理中抛出异常时 after_request 不一定执行，在 teardown 中减少进行中的请求数
+@app.teardown_request
+def end_in_flight(exc):
+    metrics.IN_FLIGHT.dec()
+
 # 时间戳转化为“YYYY.MM.DD”
 def format_unix_time(unix_time):
     return datetime.utcfromtimestamp(unix_time).strftime('%Y.%m.%d')
@@ -51,6 +120,8 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), nullable=False)
+    # 修改密码、角色时加1，之前签发的令牌和各 worker 中的认证缓存随之失效（见 migrations/versions/0003）
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     
     def set_password(self, password):
         # 存储明文密码
@@ -59,15 +130,151 @@ class User(db.Model):
         # 比较明文密码
         return self.password == password
 
-# 根据用户名查询用户，并验证密码
-@auth.verify_password
+# 认证通过的用户信息，只保留权限判断需要的字段，可以脱离数据库会话使用
+AuthUser = namedtuple("AuthUser", ["id", "username", "role", "token_version"])
+
+# 认证结果缓存，避免每个请求都查询 users 表
+class AuthCache:
+    """
+    缓存验证通过的 用户名 -> (密码摘要, 用户信息, 过期时间)
+    只保存带进程内随机盐的密码摘要，不保存明文密码
+    超过 ttl 秒的条目失效，超过 max_size 条时淘汰最久未使用的条目
+    缓存是每个 worker 各自的，命中时还要核对用户信息中的 token_version 与 CREDENTIAL_VERSIONS 一致，
+    其他 worker 修改或删除用户后，最多 AUTH_VERSION_TTL 秒后不再使用旧的条目
+    """
+
+    def __init__(self, ttl=300, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._salt = secrets.token_bytes(16)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _digest(self, password):
+        return hmac.new(self._salt, password.encode("utf-8"), hashlib.sha256).digest()
+
+    # 用户名和密码与缓存一致且未过期时返回用户信息，否则返回 None
+    def get(self, username, password):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            digest, user, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+        if hmac.compare_digest(digest, self._digest(password)):
+            return user
+        return None
+
+    def put(self, username, password, user):
+        entry = (self._digest(password), user, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[username] = entry
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # 用户密码、角色变化或被删除时立即移除缓存
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+AUTH_CACHE = AuthCache(
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", "300")),
+    max_size=int(os.environ.get("AUTH_CACHE_SIZE", "1024")),
+)
+
+# 用户当前的 (用户名, token_version)，令牌和认证缓存命中时与其比对
+class CredentialVersions:
+    """
+    从 users 表读取用户的 token_version。users 表是所有 worker 和副本共享的状态，
+    某个 worker 修改或删除用户后，其他 worker 重新查询时就会发现版本不一致。
+    查询结果在进程内缓存 ttl 秒，稳定的请求流量中每个用户每 ttl 秒最多查询一次 users 表，
+    代价是其他 worker 最多延迟 ttl 秒才发现变化（本进程中由 forget_user_credentials 立即生效）；
+    0 表示每次都查询。
+    """
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = Lock()
+
+    # 用户不存在时返回 None
+    def get(self, user_id):
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() < entry[1]:
+                return entry[0]
+        row = db.session.execute(
+            select(User.username, User.token_version).where(User.id == user_id)
+        ).first()
+        current = None if row is None else (row.username, row.token_version)
+        self.put(user_id, current)
+        return current
+
+    # 记录刚从 users 表读到的版本，避免紧接着的缓存命中再查询一次
+    def put(self, user_id, current):
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (current, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+CREDENTIAL_VERSIONS = CredentialVersions(ttl=float(os.environ.get("AUTH_VERSION_TTL", "5")))
+
+# 根据用户名查询用户，并验证密码；缓存命中时只在内存中核对 token_version，不查询数据库
+@basic_auth.verify_password
 def verify_password(username, password):
+    cached = AUTH_CACHE.get(username, password)
+    if cached is not None:
+        if CREDENTIAL_VERSIONS.get(cached.id) == (cached.username, cached.token_version):
+            g.user = cached
+            return True
+        # 其他 worker 修改或删除了该用户
+        AUTH_CACHE.invalidate(username)
     user = User.query.filter_by(username=username).first()
     if user and user.check_password(password):
-        g.user = user  # 存储用户信息到全局对象g
+        g.user = AuthUser(user.id, user.username, user.role, user.token_version)  # 存储用户信息到全局对象g
+        AUTH_CACHE.put(username, password, g.user)
+        CREDENTIAL_VERSIONS.put(user.id, (user.username, user.token_version))
         return True
     return False
 
+# 签发包含用户id、用户名、角色和 token_version 的令牌
+def issue_token(user):
+    return token_serializer.dumps({
+        "id": user.id, "username": user.username, "role": user.role, "ver": user.token_version,
+    })
+
+# 校验令牌签名和有效期，并核对签发时的 token_version 与 CREDENTIAL_VERSIONS 中的一致，
+# 默认使用进程内缓存的版本，其他 worker 撤销的令牌最多还能使用 AUTH_VERSION_TTL 秒
+@token_auth.verify_token
+def verify_token(token):
+    try:
+        data = token_serializer.loads(token, max_age=TOKEN_TTL)
+    except (SignatureExpired, BadSignature):
+        return False
+    # 增加 token_version 之前签发的令牌没有 ver，视为版本0
+    version = data.get("ver", 0)
+    if CREDENTIAL_VERSIONS.get(data["id"]) != (data["username"], version):
+        return False
+    g.user = AuthUser(data["id"], data["username"], data["role"], version)
+    return True
+
+# 在当前事务中增加用户的 token_version，提交后之前签发的令牌和所有 worker 中的认证缓存失效
+def revoke_user_credentials(user):
+    user.token_version = User.token_version + 1
+
+# 提交之后移除本进程中的缓存，使修改在本进程内立即生效（AUTH_VERSION_TTL 大于0时也是如此）
+def forget_user_credentials(user_id, username):
+    AUTH_CACHE.invalidate(username)
+    CREDENTIAL_VERSIONS.invalidate(user_id)
+
 # 角色权限装饰器
 def role_required(*roles):
     def decorator(func):
@@ -80,13 +287,18 @@ def role_required(*roles):
     return decorator
 
 # 接口一
-# 登录接口，只进行基本身份验证
+# 登录接口，验证身份后签发令牌，之后的请求可以使用 "Authorization: Bearer <token>"
 @app.route('/login', methods=['POST'])
 @auth.login_required
 def login():
     user = g.user
     if user:
-        return jsonify({"username": user.username, "role": user.role}), 200
+        return jsonify({
+            "username": user.username,
+            "role": user.role,
+            "token": issue_token(user),
+            "expires_in": TOKEN_TTL
+        }), 200
     else:
         return jsonify({"message": "Invalid username or password"}), 401
 
@@ -186,8 +398,10 @@ def update_user(username):
             user.set_password(data['password'])
         if 'role' in data:
             user.role = data['role']
+        revoke_user_credentials(user)
         
         db.session.commit()
+        forget_user_credentials(user.id, username)
         return jsonify({
             "code": 1,
             "message": "User updated",
@@ -226,6 +440,8 @@ def delete_user(username):
     }
     db.session.delete(user)
     db.session.commit()
+    # 用户已不存在，令牌和其他 worker 中的认证缓存在比对 token_version 时失效
+    forget_user_credentials(user_info["id"], username)
     return jsonify({
         "code": 1,
         "message": "User deleted successfully",
@@ -271,6 +487,13 @@ class Dataset(db.Model):
     source = db.Column(db.Integer)  # 数据来源
     create_time = db.Column(db.BigInteger)  # 创建时间
 
+    # 索引由 migrations/versions/0002_dataset_indexes.py 创建，这里声明以保持模型与表结构一致
+    __table_args__ = (
+        db.Index("ix_dataset_label", "label"),
+        db.Index("ix_dataset_create_time", "create_time"),
+        db.Index("ix_dataset_label_create_time", "label", "create_time"),
+    )
+
     # 将数据记录转换为字典形式，便于JSON序列化
     def to_dict(self):
         return {
@@ -281,37 +504,443 @@ class Dataset(db.Model):
             "create_time": self.create_time,
         }
 
+# dataset 表行数的内存计数，按标签细分
+class DatasetCounter:
+    """
+    写入、更新、删除数据时同步增减计数，读取时不扫描全表
+    计数每隔 reconcile_interval 秒用一次 GROUP BY 查询与数据库校准，
+    多进程部署或绕过接口直接写库时计数是近似值
+    """
+
+    def __init__(self, reconcile_interval=300):
+        self.reconcile_interval = reconcile_interval
+        self._counts = None
+        self._reconciled_at = 0.0
+        self._lock = Lock()
+
+    # 从数据库重新统计各标签的行数
+    def reconcile(self):
+        rows = db.session.query(Dataset.label, func.count(Dataset.id)).group_by(Dataset.label).all()
+        with self._lock:
+            self._counts = {str(label): count for label, count in rows}
+            self._reconciled_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._counts is None or time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+            self.reconcile()
+
+    def _apply(self, label, delta):
+        # 还没有从数据库统计过时无需记录增量，首次读取会完整统计
+        with self._lock:
+            if self._counts is not None:
+                key = str(label)
+                self._counts[key] = max(self._counts.get(key, 0) + delta, 0)
+
+    def add(self, labels):
+        for label in labels:
+            self._apply(label, 1)
+
+    def remove(self, label):
+        self._apply(label, -1)
+
+    def move(self, old_label, new_label):
+        if str(old_label) != str(new_label):
+            self._apply(old_label, -1)
+            self._apply(new_label, 1)
+
+    # 返回总行数，指定 label 时只返回该标签的行数
+    def total(self, label=None):
+        self._ensure_fresh()
+        with self._lock:
+            if label is None:
+                return sum(self._counts.values())
+            return self._counts.get(str(label), 0)
+
+    # 返回各标签的行数
+    def by_label(self):
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._counts)
+
+DATASET_COUNTER = DatasetCounter(
+    reconcile_interval=float(os.environ.get("DATASET_COUNT_RECONCILE_INTERVAL", "300"))
+)
+
+# 接口十九
 # 计算并返回数据库中的数据集数量
+@app.route("/datasets/count", methods=["GET"])
+@auth.login_required
+@role_required("admin")
 def count_datasets():
-    count = Dataset.query.count()
-    return jsonify({"count": count})
+    """
+    不需要 JSON 输入
+    返回总行数和按标签细分的行数，读取内存计数，不扫描全表
+    """
+    return jsonify({"count": DATASET_COUNTER.total(), "labels": DATASET_COUNTER.by_label()})
+
+# 导出时每次从服务端游标取出并编码的行数
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "5000"))
+
+# 接口二十四
+# 流式导出训练数据，支持 CSV、NDJSON、Parquet
+@app.route("/datasets/export", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def export_datasets():
+    """
+    不需要 JSON 输入
+    请求参数：format（csv/ndjson/parquet，默认csv）、label、start_time、end_time（create_time 的范围，Unix 秒，左闭右开）
+    使用服务端游标按 id 顺序分块读取，边读边编码边发送，内存占用与表的大小无关
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"code": 0, "error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    label = request.args.get("label")
+    start_time = request.args.get("start_time", type=int)
+    end_time = request.args.get("end_time", type=int)
+
+    query = select(Dataset.id, Dataset.text, Dataset.label, Dataset.source, Dataset.create_time).order_by(Dataset.id)
+    if label is not None:
+        query = query.where(Dataset.label == label)
+    if start_time is not None:
+        query = query.where(Dataset.create_time >= start_time)
+    if end_time is not None:
+        query = query.where(Dataset.create_time < end_time)
+
+    # 生成器在视图返回后才执行，此时已经离开应用上下文，先取出引擎
+    engine = db.engine
+
+    def generate():
+        # 独立的连接在整个响应期间保持打开，stream_results 在 PostgreSQL 上使用服务端游标
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_CHUNK_SIZE).execute(query)
+            yield from encode_rows(result.partitions(EXPORT_CHUNK_SIZE), fmt)
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=dataset.{extension}",
+    })
+
+# 根据总行数计算总页数
+def page_count(total, per_page):
+    return (total + per_page - 1) // per_page if per_page > 0 else 0
+
+# 游标分页：游标是对翻页方向和边界id的编码，客户端只需原样传回
+def encode_cursor(direction, dataset_id):
+    return base64.urlsafe_b64encode(f"{direction}:{dataset_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """返回 (after_id, before_id)，格式不合法时抛出 ValueError"""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    direction, dataset_id = raw.split(":", 1)
+    if direction == "a":
+        return int(dataset_id), None
+    if direction == "b":
+        return None, int(dataset_id)
+    raise ValueError(f"Unknown cursor direction: {direction}")
+
+# 请求中带有 cursor/after_id/before_id 任一参数时使用游标分页，否则继续使用页码分页
+def is_keyset_request():
+    return any(arg in request.args for arg in ("cursor", "after_id", "before_id"))
+
+# 解析游标分页参数，返回 (after_id, before_id)
+def keyset_args():
+    args = request.args
+    if args.get("cursor"):
+        return decode_cursor(args["cursor"])
+    return args.get("after_id", type=int), args.get("before_id", type=int)
+
+# 按 id 做游标分页，每页只读取 per_page+1 行，耗时与翻到第几页无关
+def keyset_paginate(query, after_id, before_id, per_page):
+    if before_id is not None:
+        # 向前翻页：倒序取 before_id 之前的记录，再恢复升序
+        rows = query.filter(Dataset.id < before_id).order_by(Dataset.id.desc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        # before_id 所在的行可能已被删除，只有后面还有记录时才返回 next_cursor
+        has_next = query.filter(Dataset.id >= before_id).with_entities(Dataset.id).limit(1).first() is not None
+    else:
+        page_query = query if after_id is None else query.filter(Dataset.id > after_id)
+        rows = page_query.order_by(Dataset.id).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        # after_id 为0或早于第一行时前面没有记录，不返回 prev_cursor
+        has_prev = after_id is not None and (
+            query.filter(Dataset.id <= after_id).with_entities(Dataset.id).limit(1).first() is not None
+        )
+    return {
+        "data": [row.to_dict() for row in rows],
+        "per_page": per_page,
+        "next_cursor": encode_cursor("a", rows[-1].id) if rows and has_next else None,
+        "prev_cursor": encode_cursor("b", rows[0].id) if rows and has_prev else None,
+    }
+
+# 游标分页的响应，with_total=1 时附带近似总数
+def keyset_response(query, per_page, label=None):
+    try:
+        after_id, before_id = keyset_args()
+    except ValueError:
+        return jsonify({"code": 0, "error": "Invalid cursor"}), 400
+    result = keyset_paginate(query, after_id, before_id, per_page)
+    if request.args.get("with_total", "").lower() in ("1", "true"):
+        result["total"] = DATASET_COUNTER.total(label)
+    return jsonify(result), 200
+
+# 重训练调度器：默认只响应 POST /retrain；RETRAIN_AUTO=1 时，新增 RETRAIN_MIN_ROWS 行，
+# 或距离上次训练超过 RETRAIN_INTERVAL 秒且有新数据时自动触发
+# 排队后等待 RETRAIN_DEBOUNCE 秒内没有新数据再开始，合并密集插入引起的多次触发
+# 训练在独立的子进程（src/retrain.py）中执行，不与请求处理争用 worker 的 CPU 和 GIL
+RETRAIN_SCHEDULER = RetrainScheduler(
+    [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrain.py")],
+    state_dir=os.environ.get("RETRAIN_STATE_DIR", f"{train_pre_csv.BASE_PATH}/retrain"),
+    auto=os.environ.get("RETRAIN_AUTO", "0") == "1",
+    min_rows=int(os.environ.get("RETRAIN_MIN_ROWS", "1000")),
+    interval=float(os.environ.get("RETRAIN_INTERVAL", "3600")),
+    debounce=float(os.environ.get("RETRAIN_DEBOUNCE", "5")),
+)
+
+# 记录新写入的数据：更新行数计数并通知重训练调度器
+def on_datasets_created(labels):
+    DATASET_COUNTER.add(labels)
+    RETRAIN_SCHEDULER.record_rows(len(labels))
 
 # 异步任务函数，用于处理数据预测和存储
 def async_task(data, label):
     create_time = int(time.time())
-    formatted_time = format_unix_time(create_time)
     # 创建一个新的Dataset对象，并保存到数据库
     predict_result = Dataset(
         text=data["text"], label=label, source=1, create_time=create_time
     )
     db.session.add(predict_result)
     db.session.commit()
-    # 每100条数据后触发一次模型训练
-    if Dataset.query.count() % 10 == 0:
-        # 可以选择直接在这里调用训练脚本，或者通过Kubernetes API启动训练
-        train_pre_csv.main()
-        train_embed.main()
-        train_svm.main()
-
-# 存储已加载的模型，避免重复加载
-MODEL_SET = {}
-
-# 获取或加载指定的模型
+    # 只记录新增行数，是否重训练由后台调度器决定，不在请求中执行训练
+    on_datasets_created([label])
+
+# 为 1 时 sklearn 模型直接加载原生估计器，跳过 pyfunc 包装的输入转换
+MODEL_FAST_PATH = os.environ.get("MODEL_FAST_PATH", "1") == "1"
+
+# 为 1 时优先加载 train_svm 导出的紧凑推理格式，不需要反序列化 sklearn 对象，也不依赖 train_embed 的向量化器
+COMPACT_MODEL = os.environ.get("COMPACT_MODEL", "0") == "1"
+# 紧凑格式的本地目录，按 模型名/版本号 存放，多个 worker 共享同一份内存映射文件
+COMPACT_MODEL_DIR = os.environ.get("COMPACT_MODEL_DIR", "/root/data/model/compact")
+
+# 下载并加载模型版本对应 run 中的 compact 产物，本地已有时直接加载
+def load_compact_model(name, ver):
+    model_dir = os.path.join(COMPACT_MODEL_DIR, name, str(ver))
+    if not os.path.exists(os.path.join(model_dir, "meta.json")):
+        run_id = mlflow.MlflowClient().get_model_version(name, str(ver)).run_id
+        os.makedirs(os.path.dirname(model_dir), exist_ok=True)
+        tmp_dir = f"{model_dir}.{os.getpid()}.tmp"
+        try:
+            local_path = mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path="compact", dst_path=tmp_dir)
+            # 下载完成后再改名，其他进程不会读到不完整的目录
+            try:
+                os.rename(local_path, model_dir)
+            except OSError:
+                if not os.path.exists(os.path.join(model_dir, "meta.json")):
+                    raise
+        finally:
+            # 下载或改名失败时也删除临时目录，回退到 MLflow 模型后不会留下残留文件
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return CompactModel(model_dir)
+
+# 从 MLflow 模型注册表加载指定版本的模型
+def load_registered_model(name, ver):
+    """
+    开启 COMPACT_MODEL 且该版本导出过紧凑格式时加载 CompactModel；
+    sklearn 模型（train_svm 记录的 GridSearchCV/SVC）用 mlflow.sklearn.load_model 加载，
+    predict/decision_function 直接作用于 CSR 稀疏矩阵；其他模型退回 pyfunc
+    """
+    if COMPACT_MODEL:
+        try:
+            return load_compact_model(name, ver)
+        except Exception as e:
+            print(f"Failed to load compact model {name}/{ver}, falling back to MLflow: {e}")
+    model_uri = f"models:/{name}/{ver}"
+    if MODEL_FAST_PATH:
+        try:
+            flavors = mlflow.models.get_model_info(model_uri).flavors
+        except Exception as e:
+            print(f"Failed to read flavors of {model_uri}, falling back to pyfunc: {e}")
+            flavors = {}
+        if "sklearn" in flavors:
+            return mlflow.sklearn.load_model(model_uri)
+    return mlflow.pyfunc.load_model(model_uri=model_uri)
+
+# 已加载模型的 LRU 缓存，最多 MODEL_CACHE_SIZE 个、估算总大小不超过 MODEL_CACHE_MAX_BYTES（0为不限制）
+# 版本号可以使用 Production/Staging/latest/@别名，每 MODEL_ALIAS_REFRESH 秒重新解析一次
+MODEL_CACHE = ModelCache(
+    load_registered_model,
+    max_models=int(os.environ.get("MODEL_CACHE_SIZE", "4")),
+    max_bytes=int(os.environ.get("MODEL_CACHE_MAX_BYTES", "0")),
+    alias_refresh=float(os.environ.get("MODEL_ALIAS_REFRESH", "60")),
+    # 模型被淘汰时一并释放其预处理产物和预测结果
+    on_evict=lambda name, ver: release_model(name, ver),
+)
+
+# 预测结果缓存：重复的评论直接返回缓存的标签，最多 PREDICT_CACHE_SIZE 条（0为关闭），有效期 PREDICT_CACHE_TTL 秒
+PREDICT_CACHE = PredictionCache(
+    max_size=int(os.environ.get("PREDICT_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PREDICT_CACHE_TTL", "3600")),
+)
+
+# 释放被淘汰模型版本的预处理产物和预测结果
+def release_model(name, ver):
+    ARTIFACT_SET.pop((name, ver), None)
+    PREDICT_CACHE.invalidate(name, ver)
+
+# 获取或加载指定的模型，并发请求同一个未加载的模型时只加载一次
 def get_model(name, ver):
-    if (name, ver) not in MODEL_SET:
-        model = mlflow.pyfunc.load_model(model_uri=f"models:/{name}/{ver}")
-        MODEL_SET[(name, ver)] = model
-    return MODEL_SET[(name, ver)]
+    return MODEL_CACHE.get(name, ver)
+
+# 预处理产物（由 train_embed 生成）的路径
+VECTORIZER_PATH = os.environ.get("VECTORIZER_PATH", "/root/data/model/tfidf_vectorizer.joblib")
+SVD_PATH = os.environ.get("SVD_PATH", "/root/data/model/svd.joblib")
+# 检查产物文件是否变化的最小间隔（秒），避免每次请求都访问磁盘
+ARTIFACT_CHECK_INTERVAL = float(os.environ.get("ARTIFACT_CHECK_INTERVAL", "5"))
+
+# 存储已加载的预处理产物 {(model_name, model_version): (文件签名, 上次检查时间, vectorizer, svd)}
+ARTIFACT_SET = {}
+ARTIFACT_LOCK = Lock()
+
+# 用修改时间和大小作为文件签名，文件不存在时返回 None
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# 获取指定模型版本对应的向量化器和SVD（svd.joblib 不存在时为 None）
+def get_artifacts(name, ver):
+    """
+    每个模型版本的产物最多加载一次，之后直接使用内存中的对象
+    磁盘上的文件被重新训练覆盖后，重新加载并整体替换缓存项
+    """
+    key = (name, ver)
+    now = time.monotonic()
+    cached = ARTIFACT_SET.get(key)
+    if cached is not None and now - cached[1] < ARTIFACT_CHECK_INTERVAL:
+        return cached[2], cached[3]
+
+    signature = (file_signature(VECTORIZER_PATH), file_signature(SVD_PATH))
+    with ARTIFACT_LOCK:
+        cached = ARTIFACT_SET.get(key)
+        if cached is not None and cached[0] == signature:
+            ARTIFACT_SET[key] = (signature, now, cached[2], cached[3])
+            return cached[2], cached[3]
+
+        # 向量化器被重新训练覆盖后，该版本之前的预测结果不再可信
+        if cached is not None:
+            PREDICT_CACHE.invalidate(name, ver)
+
+        # 其他模型版本已加载过相同文件时直接复用，不重复反序列化
+        for other in ARTIFACT_SET.values():
+            if other[0] == signature:
+                vectorizer, svd = other[2], other[3]
+                break
+        else:
+            vectorizer = load(VECTORIZER_PATH)
+            svd = load(SVD_PATH) if signature[1] is not None else None
+        # 整体替换元组，读取方不会看到新旧混合的状态
+        ARTIFACT_SET[key] = (signature, now, vectorizer, svd)
+    return vectorizer, svd
+
+# 已加载的模型及其向量化器；紧凑格式自带训练时的词表和 IDF，vectorizer 为 None
+Predictor = namedtuple("Predictor", ["model", "vectorizer"])
+
+# 解析版本号并取得模型和向量化器，未加载时会下载模型，只在请求线程中调用
+def get_predictor(name, ver):
+    # 别名先解析为具体版本号，向量化器缓存随之切换
+    ver = MODEL_CACHE.resolve(name, ver)
+    model = get_model(name, ver)
+    if isinstance(model, CompactModel):
+        return Predictor(model, None)
+    # 获取缓存的向量化器，只有文件变化时才会重新加载
+    vectorizer, svd = get_artifacts(name, ver)
+    return Predictor(model, vectorizer)
+
+# 用已加载的模型对一组文本进行向量化和预测，返回与输入顺序一致的整数标签列表
+def predict_with(predictor, texts):
+    model, vectorizer = predictor
+    # 整批只做一次稀疏矩阵转换
+    with metrics.predict_stage("vectorize"):
+        tfidf_matrix = model.transform(texts) if vectorizer is None else vectorizer.transform(texts)
+    # reduced_matrix = svd.transform(tfidf_matrix)
+
+    # 进行预测
+    with metrics.predict_stage("model_predict"):
+        if vectorizer is None:
+            return [int(label) for label in model.predict_transformed(tfidf_matrix)]
+        return [int(label) for label in model.predict(tfidf_matrix)]
+
+# 对一组文本进行向量化和预测，返回与输入顺序一致的整数标签列表
+def predict_labels(name, ver, texts):
+    return predict_with(get_predictor(name, ver), texts)
+
+# 微批处理配置：等待窗口（毫秒）和单批最大条数，窗口设为0时关闭微批处理
+# 没有并发请求时不等待窗口，见 MicroBatcher
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2"))
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get("PREDICT_BATCH_MAX_SIZE", "32"))
+
+# 并发的单条预测请求按已加载的模型（Predictor）合并为一次 transform+predict。
+# 解析别名和加载模型在请求线程中完成，冷启动的模型不会阻塞其他模型的批次
+PREDICT_BATCHER = MicroBatcher(
+    predict_with,
+    max_batch_size=PREDICT_BATCH_MAX_SIZE,
+    max_wait=PREDICT_BATCH_WINDOW_MS / 1000,
+) if PREDICT_BATCH_WINDOW_MS > 0 else None
+
+# 预测单条文本，命中结果缓存时直接返回，否则开启微批处理时与其他并发请求合并预测
+def predict_one(name, ver, text):
+    ver = MODEL_CACHE.resolve(name, ver)
+    label = PREDICT_CACHE.get(name, ver, text)
+    if label is not None:
+        return label
+    if PREDICT_BATCHER is None:
+        label = predict_labels(name, ver, [text])[0]
+    else:
+        label = PREDICT_BATCHER.submit(get_predictor(name, ver), text)
+    PREDICT_CACHE.put(name, ver, text, label)
+    return label
+
+# 预测一组文本，只对未命中结果缓存的文本做向量化和推理，返回与输入顺序一致的标签列表
+def predict_texts(name, ver, texts):
+    ver = MODEL_CACHE.resolve(name, ver)
+    labels = [PREDICT_CACHE.get(name, ver, text) for text in texts]
+    # 同一批中重复的文本只预测一次
+    misses = {}
+    for i, label in enumerate(labels):
+        if label is None:
+            misses.setdefault(texts[i], []).append(i)
+    if misses:
+        predicted = predict_labels(name, ver, list(misses))
+        for (text, indexes), label in zip(misses.items(), predicted):
+            for i in indexes:
+                labels[i] = label
+            PREDICT_CACHE.put(name, ver, text, label)
+    return labels
+
+# 批量写入一组预测记录，供异步写入的后台线程调用
+def write_predictions(rows):
+    with app.app_context(), metrics.predict_stage("db_write"):
+        db.session.execute(insert(Dataset), rows)
+        db.session.commit()
+    on_datasets_created([row["label"] for row in rows])
+
+# 为 1 时 /predict 的预测记录先放入内存队列，由后台线程每 PREDICT_WRITE_FLUSH_ROWS 行或
+# PREDICT_WRITE_FLUSH_MS 毫秒批量写入，响应不再等待数据库提交，返回的 id 为 null
+PREDICT_WRITE_BEHIND = os.environ.get("PREDICT_WRITE_BEHIND", "0") == "1"
+PREDICT_WRITER = WriteBehindWriter(
+    write_predictions,
+    max_queue=int(os.environ.get("PREDICT_WRITE_QUEUE", "10000")),
+    flush_rows=int(os.environ.get("PREDICT_WRITE_FLUSH_ROWS", "500")),
+    flush_interval=float(os.environ.get("PREDICT_WRITE_FLUSH_MS", "50")) / 1000,
+    block_timeout=float(os.environ.get("PREDICT_WRITE_BLOCK_MS", "1000")) / 1000,
+) if PREDICT_WRITE_BEHIND else None
+if PREDICT_WRITER is not None:
+    # 开发服务器等没有调用 shutdown 的退出方式，也把队列中的数据写完
+    atexit.register(PREDICT_WRITER.stop, 10)
 
 # 接口八
 # 模型预测接口，接收数据并返回预测结果
@@ -328,42 +957,152 @@ def predict_text():
     }
     """
     data = request.json
-    model = get_model(data["model_name"], data["model_version"])
-
-    # 加载向量化器
-    vectorizer = load('/root/data/model/tfidf_vectorizer.joblib')
-    # svd = load('/root/data/model/svd.joblib')
-    
-    # 使用向量化器转换文本
-    tfidf_matrix = vectorizer.transform([data["text"]])
-    # reduced_matrix = svd.transform(tfidf_matrix)
-
-    # 进行预测
-    label = model.predict(tfidf_matrix)[0]
+    # 非字符串的 text 不能作为结果缓存的键，也不能交给向量化器
+    if not isinstance(data.get("text"), str):
+        return jsonify({"code": 0, "error": "text must be a string"}), 400
+    label = predict_one(data["model_name"], data["model_version"], data["text"])
 
     # 创建新的数据集条目
     create_time = int(time.time())
-    new_dataset = Dataset(
-        text=data["text"], label=int(label), source=1, create_time=create_time
-    )
-    db.session.add(new_dataset)
-    db.session.commit()
-
-    dataset_info = new_dataset.to_dict()
+    row = {"text": data["text"], "label": label, "source": 1, "create_time": create_time}
+    if PREDICT_WRITER is not None and PREDICT_WRITER.submit(row):
+        # 由后台线程批量写入，此时还没有分配 id
+        dataset_info = dict(row, id=None, label=str(label))
+    else:
+        # 未开启异步写入，或队列持续写满时同步写入
+        new_dataset = Dataset(**row)
+        with metrics.predict_stage("db_write"):
+            db.session.add(new_dataset)
+            db.session.commit()
+        on_datasets_created([label])
+        dataset_info = new_dataset.to_dict()
     dataset_info['create_time'] = format_unix_time(create_time)
 
     return jsonify({"code": 1, "data": dataset_info}), 200
 
-# 接口九
-# 列出所有已注册的模型
-@app.route("/models", methods=["GET"])
+# 单次批量预测允许的最大文本条数
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+
+# 接口十五
+# 批量预测接口，一次请求预测多条文本并批量写入数据库
+@app.route("/predict/batch", methods=["POST"])
 @auth.login_required
 @role_required('admin','user')
-def list_models():
+def predict_batch():
+    """
+    命中结果缓存的文本直接使用缓存的标签，其余文本只做一次 transform 和一次 predict，结果用一条批量 INSERT 写入并只提交一次
+    JSON 输入示例：
+    {
+        "model_name": "my_model",
+        "model_version": "v1",
+        "texts": ["text 1", "text 2"]
+    }
+    """
+    data = request.json
+    texts = data.get("texts")
+    if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+        return jsonify({"code": 0, "error": "texts must be a non-empty list of strings"}), 400
+    if len(texts) > MAX_BATCH_SIZE:
+        return jsonify({"code": 0, "error": f"At most {MAX_BATCH_SIZE} texts per request"}), 400
+
+    labels = predict_texts(data["model_name"], data["model_version"], texts)
+
+    create_time = int(time.time())
+    rows = [
+        {"text": text, "label": label, "source": 1, "create_time": create_time}
+        for text, label in zip(texts, labels)
+    ]
+    # 单条 INSERT ... RETURNING 批量写入，取回自增id
+    with metrics.predict_stage("db_write"):
+        ids = db.session.scalars(insert(Dataset).returning(Dataset.id, sort_by_parameter_order=True), rows).all()
+        db.session.commit()
+    on_datasets_created(labels)
+
+    formatted_time = format_unix_time(create_time)
+    for row, dataset_id in zip(rows, ids):
+        row["id"] = dataset_id
+        row["label"] = str(row["label"])
+        row["create_time"] = formatted_time
+    return jsonify({"code": 1, "data": rows}), 200
+
+# 接口十六
+# 查看微批处理的批大小和排队等待时间统计
+@app.route("/predict/batching", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def predict_batching_stats():
     """
     不需要 JSON 输入
-    返回所有模型列表
+    未开启微批处理时 enabled 为 false
     """
+    if PREDICT_BATCHER is None:
+        return jsonify({"code": 1, "enabled": False}), 200
+    return jsonify({
+        "code": 1,
+        "enabled": True,
+        "window_ms": PREDICT_BATCH_WINDOW_MS,
+        "max_batch_size": PREDICT_BATCH_MAX_SIZE,
+        "stats": PREDICT_BATCHER.stats(),
+    }), 200
+
+# 接口二十
+# 查看模型缓存状态
+@app.route("/models/cache", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def model_cache_stats():
+    """
+    不需要 JSON 输入
+    返回命中/未命中/加载/淘汰次数、当前缓存的模型以及别名解析结果
+    """
+    return jsonify({"code": 1, "data": MODEL_CACHE.stats()}), 200
+
+# 接口二十一
+# 查看预测结果缓存状态
+@app.route("/predict/cache", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def predict_cache_stats():
+    """
+    不需要 JSON 输入
+    返回命中/未命中/淘汰/过期/失效次数和当前缓存的条数
+    """
+    return jsonify({"code": 1, "enabled": PREDICT_CACHE.enabled, "data": PREDICT_CACHE.stats()}), 200
+
+# 接口二十二
+# 查看预测记录异步写入的状态
+@app.route("/predict/writer", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def predict_writer_stats():
+    """
+    不需要 JSON 输入
+    未开启异步写入时 enabled 为 false
+    """
+    if PREDICT_WRITER is None:
+        return jsonify({"code": 1, "enabled": False}), 200
+    return jsonify({"code": 1, "enabled": True, "data": PREDICT_WRITER.stats()}), 200
+
+# 接口二十三
+# 查看每个接口的数据库耗时和连接池状态
+@app.route("/db/stats", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def db_stats():
+    """
+    不需要 JSON 输入
+    endpoints 中为每个接口累计的请求数、SQL 语句数、数据库耗时及其占请求耗时的比例
+    """
+    pool = db.engine.pool
+    pool_stats = {"status": pool.status()}
+    # QueuePool 提供连接数明细
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            pool_stats[name] = getattr(pool, name)()
+    return jsonify({"code": 1, "data": {"endpoints": DB_TIMING.stats(), "pool": pool_stats}}), 200
+
+# 从 MLflow 模型注册表读取所有模型及其各阶段的最新版本
+def fetch_registered_models():
     registered_models = mlflow.search_registered_models()
     models_list = []
     for model in registered_models:
@@ -377,18 +1116,79 @@ def list_models():
             }
             model_info["versions"].append(version_info)
         models_list.append(model_info)
-    # try:
-    #     model = get_model("mlops", "2")
-    #     print("模型加载成功")
-    # except Exception as e:
-    #     print(f"模型加载失败: {e}")
-    # try:
-    #     test_input = ["这是一个测试文本。"]
-    #     prediction = model.predict(test_input)
-    #     print("预测结果:", prediction)
-    # except Exception as e:
-    #     print(f"预测过程中出错: {e}")
-    return jsonify(models_list)
+    return models_list
+
+# 模型注册表的内存快照，由后台线程定期刷新
+class RegistrySnapshot:
+    """
+    /models 直接返回内存中的快照，不在请求中访问 MLflow
+    快照内容的哈希作为 ETag，内容不变时客户端可以用 If-None-Match 得到 304
+    刷新失败时继续使用旧快照
+    """
+
+    def __init__(self, fetch, interval=30):
+        self.fetch = fetch
+        self.interval = interval
+        self._snapshot = None  # (models_list, etag, fetched_at)
+        self._lock = Lock()
+        self._thread = None
+
+    def refresh(self):
+        models_list = self.fetch()
+        body = json.dumps(models_list, sort_keys=True, ensure_ascii=False)
+        etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._snapshot = (models_list, etag, time.time())
+        return self._snapshot
+
+    # 返回 (models_list, etag, fetched_at)，还没有快照时同步拉取一次
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Failed to refresh model registry snapshot: {e}")
+
+        self._thread = Thread(target=run, name="registry-snapshot", daemon=True)
+        self._thread.start()
+
+REGISTRY_SNAPSHOT = RegistrySnapshot(
+    fetch_registered_models,
+    interval=float(os.environ.get("MODEL_REGISTRY_REFRESH", "30")),
+)
+
+# 接口九
+# 列出所有已注册的模型
+@app.route("/models", methods=["GET"])
+@auth.login_required
+@role_required('admin','user')
+def list_models():
+    """
+    不需要 JSON 输入
+    返回所有模型列表，数据来自每 MODEL_REGISTRY_REFRESH 秒刷新一次的内存快照
+    支持 If-None-Match，快照未变化时返回 304
+    管理员可以使用 ?refresh=1 立即从 MLflow 重新拉取
+    """
+    if request.args.get("refresh", "").lower() in ("1", "true") and g.user.role == "admin":
+        models_list, etag, fetched_at = REGISTRY_SNAPSHOT.refresh()
+    else:
+        models_list, etag, fetched_at = REGISTRY_SNAPSHOT.get()
+    response = jsonify(models_list)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.last_modified = datetime.utcfromtimestamp(fetched_at)
+    return response.make_conditional(request)
 
 # 接口十
 # 添加训练数据，只有admin可以操作
@@ -416,12 +1216,46 @@ def create_dataset():
     )
     db.session.add(new_dataset)
     db.session.commit()
+    on_datasets_created([new_dataset.label])
 
     dataset_info = new_dataset.to_dict()
     dataset_info['create_time'] = formatted_create_time
 
     return jsonify({"code": 1, "data": dataset_info}), 200
 
+# 批量导入时每个分块（一个事务）的行数
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_CHUNK_SIZE", "10000"))
+
+# 接口二十五
+# 批量导入训练数据，请求体为 CSV 或 NDJSON，边读边分块写入
+@app.route("/datasets/bulk", methods=["POST"])
+@auth.login_required
+@role_required("admin")
+def bulk_create_datasets():
+    """
+    请求体示例（CSV，列名也可以使用 reply/is_troll）：
+        text,label,source
+        "text 1",0,1
+        "text 2",1,1
+    请求体示例（NDJSON，Content-Type: application/x-ndjson 或 ?format=ndjson）：
+        {"text": "text 1", "label": 0}
+        {"text": "text 2", "label": 1}
+    每个分块单独校验并在一个事务中写入（PostgreSQL 使用 COPY），不合法的行被跳过，
+    写入失败只影响所在的分块
+    """
+    fmt = request.args.get("format") or ("ndjson" if "json" in request.mimetype else "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"code": 0, "error": "format must be csv or ndjson"}), 400
+    chunk_size = max(1, request.args.get("chunk_size", BULK_CHUNK_SIZE, type=int))
+    source = request.args.get("source", 0, type=int)
+
+    summary = ingest(
+        db.engine, read_records(request.stream, fmt), chunk_size=chunk_size, default_source=source,
+        on_chunk=lambda result, rows: on_datasets_created([row["label"] for row in rows]),
+    )
+    ok = not summary["failed_chunks"] and not summary["invalid"]
+    return jsonify({"code": 1 if ok else 0, "data": summary}), 200
+
 # 接口十一
 # 根据id或label查找特定训练数据
 @app.route("/datasets/search", methods=["GET"])
@@ -452,8 +1286,13 @@ def search_datasets():
     query = Dataset.query
     if label is not None:
         query = query.filter_by(label=label)
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # 请求中带有 cursor/after_id/before_id 时使用游标分页
+    if is_keyset_request():
+        return keyset_response(query, per_page, label)
+    # 总数从内存计数读取，分页查询本身不再执行 COUNT(*)
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
     datasets = pagination.items
+    total = DATASET_COUNTER.total(label)
 
     if not datasets:
         return jsonify({"code": 0, "error": "No datasets found with the provided label"}), 200
@@ -462,8 +1301,8 @@ def search_datasets():
         "data": [dataset.to_dict() for dataset in datasets],
         "page": pagination.page,
         "per_page": pagination.per_page,
-        "pages": pagination.pages,
-        "total": pagination.total
+        "pages": page_count(total, pagination.per_page),
+        "total": total
     }), 200
 
 # 接口十二
@@ -486,12 +1325,14 @@ def update_dataset(dataset_id):
         return jsonify({"code": 0, "error": "Dataset not found"}), 200
 
     data = request.json
+    old_label = dataset.label
     dataset.text = data.get("text", dataset.text)
     dataset.label = data.get("label", dataset.label)
     dataset.source = data.get("source", dataset.source)
     dataset.create_time = int(time.time())
 
     db.session.commit()
+    DATASET_COUNTER.move(old_label, dataset.label)
     dataset_info = dataset.to_dict()
     dataset_info['create_time'] = format_unix_time(dataset.create_time)
 
@@ -522,6 +1363,7 @@ def delete_dataset(dataset_id):
     }
     db.session.delete(dataset)
     db.session.commit()
+    DATASET_COUNTER.remove(dataset_info["label"])
     return jsonify({
         "code": 1,
         "message": "Dataset deleted successfully",
@@ -540,24 +1382,127 @@ def list_datasets():
     该端点支持分页 可以指定页码
     使用“page”和“per_page”查询参数的每页数据集数
     示例： GET /datasets?page=3&per_page=20
+    也支持按 id 的游标分页，深翻页不再变慢：
+        GET /datasets?cursor=&per_page=20        第一页
+        GET /datasets?cursor=<next_cursor>       下一页
+        GET /datasets?after_id=100&with_total=1  id 大于100的一页，并附带近似总数
     """
     # 从查询参数中获取页码和每页记录数，设置默认值
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # 使用 paginate 方法进行分页查询
-    pagination = Dataset.query.paginate(page=page, per_page=per_page, error_out=False)
+    # 请求中带有 cursor/after_id/before_id 时使用游标分页
+    if is_keyset_request():
+        return keyset_response(Dataset.query, per_page)
+
+    # 使用 paginate 方法进行分页查询，总数从内存计数读取
+    pagination = Dataset.query.paginate(page=page, per_page=per_page, error_out=False, count=False)
     datasets = pagination.items
+    total = DATASET_COUNTER.total()
 
     return jsonify({
         "page": pagination.page,
         "per_page": pagination.per_page,
-        "total": pagination.total,
-        "pages": pagination.pages,
+        "total": total,
+        "pages": page_count(total, pagination.per_page),
         "data": [dataset.to_dict() for dataset in datasets],
-        "total": pagination.total
+        "total": total
     })
 
+# 接口十七
+# 查看重训练任务状态
+@app.route("/retrain/status", methods=["GET"])
+@auth.login_required
+@role_required("admin")
+def retrain_status():
+    """
+    不需要 JSON 输入
+    status 取值：idle（空闲）、queued（已排队）、running（训练中）、finished（已完成）、failed（失败）
+    """
+    return jsonify({"code": 1, "data": RETRAIN_SCHEDULER.status()}), 200
+
+# 接口十八
+# 手动触发一次重训练，已有排队或运行中的任务时会合并
+@app.route("/retrain", methods=["POST"])
+@auth.login_required
+@role_required("admin")
+def request_retrain():
+    """
+    不需要 JSON 输入
+    """
+    RETRAIN_SCHEDULER.request()
+    return jsonify({"code": 1, "message": "Retrain requested"}), 202
+
+# 预热完成后置为 True，就绪探针据此判断是否可以接收流量
+READY = False
+
+# 启动时预加载的模型，格式为 "name:version,name2:version2"
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "")
+
+# 服务启动预热：迁移数据库、创建默认用户、预加载模型和向量化器
+def warmup():
+    """
+    gunicorn 以 preload_app 方式启动时在 master 进程中执行一次，
+    加载好的模型在 fork 之后由各个 worker 以写时复制的方式共享
+    """
+    global READY
+    upgrade_schema(app.config["SQLALCHEMY_DATABASE_URI"])
+    with app.app_context():
+        create_default_users()
+        # fork 之前关闭 master 中的数据库连接，避免子进程共用同一个连接
+        db.engine.dispose()
+
+    for spec in filter(None, (item.strip() for item in PRELOAD_MODELS.split(","))):
+        name, ver = spec.rsplit(":", 1)
+        ver = MODEL_CACHE.resolve(name, ver)
+        # 紧凑格式自带词表和 IDF，不需要 train_embed 的向量化器（与 get_predictor 一致）
+        if not isinstance(get_model(name, ver), CompactModel):
+            get_artifacts(name, ver)
+        print(f"Preloaded model {name}/{ver}")
+    READY = True
+
+# 启动后台任务，gunicorn 中在每个 worker fork 之后调用
+def start_background_tasks():
+    RETRAIN_SCHEDULER.start()
+    MODEL_CACHE.start_refresher()
+    REGISTRY_SNAPSHOT.start()
+    METRICS_EXPORTER.start()
+
+# 把模型缓存、预测结果缓存、异步写入和重训练状态同步为 Prometheus 指标
+METRICS_EXPORTER = metrics.StatsExporter(
+    MODEL_CACHE, PREDICT_CACHE, RETRAIN_SCHEDULER, PREDICT_WRITER,
+    interval=float(os.environ.get("METRICS_SYNC_INTERVAL", "5")),
+)
+
+# Prometheus 指标，不需要认证，供 Prometheus 抓取
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    METRICS_EXPORTER.sync()
+    body, content_type = metrics.render()
+    return body, 200, {"Content-Type": content_type}
+
+# 优雅退出：停止后台任务
+def shutdown():
+    global READY
+    READY = False
+    # 正在运行的训练进程被结束并重新排队，最多等待其退出10秒
+    RETRAIN_SCHEDULER.stop(timeout=15)
+    # 把队列中尚未写入的预测记录写完
+    if PREDICT_WRITER is not None:
+        PREDICT_WRITER.stop(timeout=10)
+
+# 存活探针
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"}), 200
+
+# 就绪探针，预热完成前返回503
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    if not READY:
+        return jsonify({"status": "warming up"}), 503
+    return jsonify({"status": "ready"}), 200
+
 # 测试接口
 @app.route('/test', methods=['GET'])
 def test():
@@ -587,8 +1532,11 @@ def create_default_users():
 
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()  # 确保所有数据表都已创建
-        create_default_users()  # 创建默认用户
+    # 开发模式：单进程的 Werkzeug 调试服务器，生产环境请使用 gunicorn -c gunicorn.conf.py
+    warmup()
+
+    # debug 模式下只在实际处理请求的子进程中启动后台调度
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_tasks()
 
     app.run(host="0.0.0.0", port=8000,debug=True)
\ No newline at end of file
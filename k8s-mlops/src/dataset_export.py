@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 导出的列及其 Parquet 类型，与 dataset 表一致
+EXPORT_COLUMNS = ["id", "text", "label", "source", "create_time"]
+PARQUET_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("text", pa.string()),
+    ("label", pa.string()),
+    ("source", pa.int32()),
+    ("create_time", pa.int64()),
+])
+
+# 各导出格式的 Content-Type 和文件扩展名
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class _DrainBuffer(io.RawIOBase):
+    """只追加的写入缓冲，每次 drain 取走已写入的字节，内存占用只与一个分块有关"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_csv(chunks):
+    """
+    把行分块编码为 CSV，第一块之前输出表头。
+
+    Args:
+        chunks (iterable): 每个元素为一组行，行是按 EXPORT_COLUMNS 顺序排列的元组。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(chunks):
+    """把行分块编码为每行一个 JSON 对象"""
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+def _to_arrow(column, field):
+    """
+    把一列值转换为 field 类型的数组。字符串列先转为 str：由旧版本建表或手工建表的数据库中
+    label 可能是 INTEGER 列，直接交给 pyarrow 会抛出 ArrowTypeError，导致已输出的文件被截断。
+    """
+    if field.type == pa.string():
+        column = [None if value is None else str(value) for value in column]
+    return pa.array(column, type=field.type)
+
+
+def iter_parquet(chunks):
+    """把每个行分块写为一个 Parquet row group，写完一个 row group 就输出对应的字节"""
+    sink = _DrainBuffer()
+    writer = pq.ParquetWriter(sink, PARQUET_SCHEMA)
+    try:
+        for rows in chunks:
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [_to_arrow(column, field) for column, field in zip(columns, PARQUET_SCHEMA)],
+                schema=PARQUET_SCHEMA,
+            ))
+            yield sink.drain()
+    finally:
+        # 写入文件尾（元数据），即使没有任何行也是合法的 Parquet 文件
+        writer.close()
+    yield sink.drain()
+
+
+def encode_rows(chunks, fmt):
+    """按导出格式编码行分块，返回字节块的迭代器"""
+    encoders = {"csv": iter_csv, "ndjson": iter_ndjson, "parquet": iter_parquet}
+    return encoders[fmt](chunks)
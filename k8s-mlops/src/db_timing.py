@@ -0,0 +1,70 @@
+import time
+from threading import Lock, local
+
+from sqlalchemy import event
+
+
+class DBTiming:
+    """
+    按接口统计数据库耗时。
+
+    通过 SQLAlchemy 的 before_cursor_execute/after_cursor_execute 事件记录每条语句的耗时，
+    请求开始时调用 begin，结束时调用 end，把该请求内执行的语句数和数据库总耗时
+    累加到对应接口的统计中。计时只对调用过 begin 的线程生效，后台线程中的查询不计入。
+    """
+
+    def __init__(self):
+        self._local = local()
+        self._lock = Lock()
+        self._endpoints = {}  # {endpoint: {"requests", "queries", "db_seconds", "request_seconds"}}
+
+    def install(self, engine):
+        """在引擎上注册计时事件"""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        current = getattr(self._local, "current", None)
+        if current is not None:
+            current["queries"] += 1
+            current["db_seconds"] += elapsed
+
+    def begin(self):
+        """开始统计当前线程中的一次请求"""
+        self._local.current = {"queries": 0, "db_seconds": 0.0, "start": time.perf_counter()}
+
+    def end(self, endpoint):
+        """
+        结束当前请求的统计并累加到 endpoint 上。
+
+        Returns:
+            tuple: (语句数, 数据库耗时秒数, 请求耗时秒数)，没有调用 begin 时返回 None。
+        """
+        current = getattr(self._local, "current", None)
+        if current is None:
+            return None
+        self._local.current = None
+        request_seconds = time.perf_counter() - current["start"]
+        with self._lock:
+            totals = self._endpoints.setdefault(
+                endpoint, {"requests": 0, "queries": 0, "db_seconds": 0.0, "request_seconds": 0.0}
+            )
+            totals["requests"] += 1
+            totals["queries"] += current["queries"]
+            totals["db_seconds"] += current["db_seconds"]
+            totals["request_seconds"] += request_seconds
+        return current["queries"], current["db_seconds"], request_seconds
+
+    def stats(self):
+        """返回每个接口的请求数、语句数、数据库耗时及其占请求耗时的比例"""
+        with self._lock:
+            endpoints = {name: dict(totals) for name, totals in self._endpoints.items()}
+        for totals in endpoints.values():
+            totals["avg_queries"] = totals["queries"] / totals["requests"]
+            totals["avg_db_ms"] = totals["db_seconds"] * 1000 / totals["requests"]
+            totals["db_fraction"] = totals["db_seconds"] / totals["request_seconds"] if totals["request_seconds"] else 0.0
+        return endpoints
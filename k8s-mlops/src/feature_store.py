@@ -0,0 +1,122 @@
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# 逐行特征：只依赖评论本身，新增或修改的评论计算一次后保存，之后的重训练直接复用
+FEATURE_COLUMNS = ["id", "reply", "is_troll", "source", "create_time", "word_seg", "t-score", "e-score"]
+# 保存在 Parquet 文件元数据中的状态的键
+STATE_KEY = b"feature_store_state"
+
+
+class RunningStats:
+    """
+    一列数值的样本数、均值和离差平方和（Welford 算法），可以合并新增的值，也可以移除已删除的值，
+    不需要重新读取全部数据就能得到均值和标准差。标准差与 scipy.stats.zscore 一致（ddof=0）。
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values):
+        """合并一批新增的值"""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        n, mean = values.size, values.mean()
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def remove(self, values):
+        """移除一批之前合并过的值"""
+        values = np.asarray(values, dtype=float)
+        if values.size == 0:
+            return
+        if values.size >= self.n:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        n, mean = values.size, values.mean()
+        m2 = float(((values - mean) ** 2).sum())
+        rest = self.n - n
+        rest_mean = (self.n * self.mean - n * mean) / rest
+        delta = mean - rest_mean
+        self.m2 = max(self.m2 - m2 - delta * delta * rest * n / self.n, 0.0)
+        self.mean, self.n = rest_mean, rest
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / self.n) if self.n else float("nan")
+
+    def zscore(self, values):
+        """按当前的均值和标准差标准化，标准差为0时与 scipy 一样得到 NaN"""
+        values = np.asarray(values, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (values - self.mean) / self.std
+
+    def to_dict(self):
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state["n"], state["mean"], state["m2"])
+
+
+class FeatureStore:
+    """
+    保存已处理评论的逐行特征（FEATURE_COLUMNS），以及增量处理需要的状态：
+    高水位（已处理的最大 id 和 create_time）、被过滤掉的评论的 id、t-score/e-score 的 RunningStats。
+
+    特征和状态写在同一个 Parquet 文件中（状态在文件的键值元数据里），先写临时文件再替换，
+    不会出现特征和状态不一致的情况。fingerprint 为生成特征时使用的词典的摘要，
+    与保存时的不一致说明词典已经变化，load 返回空的特征，需要全部重新计算。
+
+    Args:
+        path (str): Parquet 文件路径。
+        fingerprint (str): 词典的摘要。
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def empty_state(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "max_id": 0,
+            "max_create_time": None,
+            "filtered_ids": [],
+            "stats": {"t-score": RunningStats().to_dict(), "e-score": RunningStats().to_dict()},
+        }
+
+    def load(self):
+        """
+        Returns:
+            tuple: (特征 DataFrame, 状态 dict)。文件不存在或词典已变化时为空的特征和初始状态。
+        """
+        if os.path.exists(self.path):
+            table = pq.read_table(self.path)
+            state = json.loads((table.schema.metadata or {}).get(STATE_KEY, b"{}"))
+            if state.get("fingerprint") == self.fingerprint:
+                return table.to_pandas(), state
+            print(f"Dictionaries changed since {self.path} was written, recomputing all features")
+        return pd.DataFrame({column: [] for column in FEATURE_COLUMNS}), self.empty_state()
+
+    def save(self, df, state):
+        """原子地写入特征和状态"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        table = pa.Table.from_pandas(df[FEATURE_COLUMNS], preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[STATE_KEY] = json.dumps(state).encode("utf-8")
+        tmp_path = f"{self.path}.tmp"
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, self.path)
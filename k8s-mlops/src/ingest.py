@@ -0,0 +1,334 @@
+import csv
+import hashlib
+import io
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from threading import Lock
+
+from sqlalchemy import column, insert, select, table
+
+# dataset 表中由导入写入的列，id 由数据库生成
+DATASET_TABLE = table("dataset", column("text"), column("label"), column("source"), column("create_time"))
+INGEST_COLUMNS = ["text", "label", "source", "create_time"]
+
+# 输入中可以使用的列名：text/label 之外兼容原始评论数据 comments.csv 的 reply/is_troll
+TEXT_FIELDS = ("text", "reply")
+LABEL_FIELDS = ("label", "is_troll")
+
+# 一个分块的导入结果：first_line/last_line 为分块首尾记录的行号，rows 为记录数，
+# duplicates 为去重跳过的行数，error 为整块写入失败的原因
+ChunkResult = namedtuple(
+    "ChunkResult", ["index", "first_line", "last_line", "rows", "inserted", "invalid", "duplicates", "error"],
+)
+
+
+class IngestError(ValueError):
+    """单条记录校验失败"""
+
+
+def read_csv_records(stream):
+    """
+    从 CSV 文本流中逐行读取记录，第一行为表头。
+
+    Yields:
+        tuple: (行号, dict)，行号为记录最后一个物理行在文件中的行号（表头为第1行）。
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        # 多行文本会占用多个物理行，使用 reader 记录的行号
+        yield reader.line_num, record
+
+
+def read_ndjson_records(stream):
+    """从 NDJSON 文本流中逐行读取记录，无法解析的行以 IngestError 作为记录返回"""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = IngestError(f"invalid JSON: {e}")
+        if not isinstance(record, (dict, IngestError)):
+            record = IngestError("each line must be a JSON object")
+        yield line_no, record
+
+
+def read_records(stream, fmt):
+    """
+    按格式读取记录。
+
+    Args:
+        stream: 二进制或文本流，例如上传的请求体或打开的文件。
+        fmt (str): csv 或 ndjson。
+    """
+    if not hasattr(stream, "encoding"):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        return read_csv_records(stream)
+    if fmt == "ndjson":
+        return read_ndjson_records(stream)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _field(record, names):
+    for name in names:
+        value = record.get(name)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def validate_record(record, default_source=0, default_time=None, max_text_length=None):
+    """
+    校验并规范化一条记录。
+
+    Args:
+        record (dict): 输入的记录，必须有 text（或 reply）和 label（或 is_troll），source、create_time 可选。
+        default_source (int): 记录中没有 source 时使用的值。
+        default_time (int): 记录中没有 create_time 时使用的时间戳，默认为当前时间。
+        max_text_length (int): 文本超过该长度时截断，None 表示不截断。
+
+    Returns:
+        dict: 可以直接写入 dataset 表的行。
+
+    Raises:
+        IngestError: 记录不合法。
+    """
+    if isinstance(record, IngestError):
+        raise record
+    text = _field(record, TEXT_FIELDS)
+    if not isinstance(text, str) or not text.strip():
+        raise IngestError("text is required")
+    if max_text_length is not None:
+        text = text[:max_text_length]
+    # PostgreSQL 的文本中不能包含 NUL 字符
+    text = text.replace("\x00", "")
+
+    label = _field(record, LABEL_FIELDS)
+    try:
+        label = str(int(label))
+    except (TypeError, ValueError):
+        raise IngestError(f"label must be an integer, got {label!r}")
+
+    source = _field(record, ("source",))
+    create_time = _field(record, ("create_time",))
+    try:
+        source = default_source if source is None else int(source)
+        create_time = (default_time or int(time.time())) if create_time is None else int(create_time)
+    except (TypeError, ValueError) as e:
+        raise IngestError(f"source and create_time must be integers: {e}")
+    return {"text": text, "label": label, "source": source, "create_time": create_time}
+
+
+def text_hash(text):
+    """文本的64位摘要，用于去重"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class TextDeduplicator:
+    """
+    按文本摘要去重，只保存每条文本的64位摘要。
+
+    from_database 读取表中已有文本的摘要，之后 claim 过滤掉已存在（包括本次导入中
+    已出现过）的行；分块写入失败时 release 归还其摘要，重新导入时不会被误判为重复。
+    多个导入线程可以共享同一个对象。
+    """
+
+    def __init__(self, hashes=()):
+        self._hashes = set(hashes)
+        self._lock = Lock()
+
+    @classmethod
+    def from_database(cls, engine, batch_size=50000):
+        """用服务端游标流式读取 dataset 表中已有的文本"""
+        dedup = cls()
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                select(DATASET_TABLE.c.text)
+            )
+            for rows in result.partitions(batch_size):
+                dedup._hashes.update(text_hash(row[0]) for row in rows)
+        return dedup
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def claim(self, rows):
+        """返回文本未出现过的行，并记录它们的摘要"""
+        kept = []
+        with self._lock:
+            for row in rows:
+                digest = text_hash(row["text"])
+                if digest not in self._hashes:
+                    self._hashes.add(digest)
+                    kept.append(row)
+        return kept
+
+    def release(self, rows):
+        """归还没有写入成功的行的摘要"""
+        with self._lock:
+            for row in rows:
+                self._hashes.discard(text_hash(row["text"]))
+
+
+def iter_chunks(records, chunk_size):
+    """把 (行号, 记录) 序列切分为最多 chunk_size 条的分块，只在内存中保留一个分块"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_rows(conn, rows):
+    """用 PostgreSQL COPY 写入一批行"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[name] for name in INGEST_COLUMNS])
+    sql = f"COPY dataset ({', '.join(INGEST_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.driver == "psycopg2":
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def load_rows(conn, rows):
+    """
+    在给定连接的当前事务中写入一批已校验的行。
+
+    PostgreSQL（psycopg2/psycopg）使用 COPY，其他数据库使用 executemany 批量 INSERT。
+    """
+    if not rows:
+        return 0
+    if conn.dialect.name == "postgresql" and conn.dialect.driver in ("psycopg2", "psycopg"):
+        _copy_rows(conn, rows)
+    else:
+        conn.execute(insert(DATASET_TABLE), rows)
+    return len(rows)
+
+
+def ingest_chunk(engine, index, chunk, default_source=0, max_text_length=None, errors=None, max_errors=100,
+                 dedup=None):
+    """
+    校验并在独立的事务中写入一个分块，写入失败只影响该分块。
+
+    Args:
+        engine: SQLAlchemy 引擎。
+        index (int): 分块序号。
+        chunk (list): [(行号, 记录)]。
+        errors (list): 用于收集校验错误 {"line", "error"}，最多 max_errors 条。
+        dedup (TextDeduplicator): 提供时跳过文本已存在的行。
+
+    Returns:
+        tuple: (ChunkResult, 写入的行列表)。
+    """
+    now = int(time.time())
+    rows, invalid = [], 0
+    for line_no, record in chunk:
+        try:
+            rows.append(validate_record(record, default_source, now, max_text_length))
+        except IngestError as e:
+            invalid += 1
+            if errors is not None and len(errors) < max_errors:
+                errors.append({"line": line_no, "error": str(e)})
+
+    duplicates = 0
+    if dedup is not None:
+        kept = dedup.claim(rows)
+        duplicates = len(rows) - len(kept)
+        rows = kept
+
+    error = None
+    try:
+        with engine.begin() as conn:
+            load_rows(conn, rows)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}".splitlines()[0]
+        if dedup is not None:
+            dedup.release(rows)
+        rows = []
+    result = ChunkResult(index, chunk[0][0], chunk[-1][0], len(chunk), len(rows), invalid, duplicates, error)
+    return result, rows
+
+
+def ingest(engine, records, chunk_size=10000, default_source=0, max_text_length=None, max_errors=100, on_chunk=None,
+           workers=1, skip_chunks=None, dedup=None):
+    """
+    分块校验并写入记录。
+
+    workers 大于1时用线程池并行写入多个分块，内存中最多同时保留 2*workers 个分块；
+    分块的划分只取决于 chunk_size，同一个输入每次得到相同的分块序号，可以用 skip_chunks
+    跳过已经写入的分块。
+
+    Args:
+        engine: SQLAlchemy 引擎，连接池大小应不小于 workers。
+        records (iterable): (行号, 记录) 序列，通常来自 read_records。
+        chunk_size (int): 每个分块的记录数，每个分块一个事务。
+        default_source (int): 记录中没有 source 时使用的值。
+        max_text_length (int): 文本超过该长度时截断。
+        max_errors (int): 返回的校验错误的最大条数。
+        on_chunk (callable): 每个分块写入后在调用方线程中以 (ChunkResult, 写入的行) 调用。
+        workers (int): 并行写入的线程数。
+        skip_chunks (set): 跳过的分块序号。
+        dedup (TextDeduplicator): 提供时跳过文本已存在的行。
+
+    Returns:
+        dict: 读取、写入、校验失败、重复的行数，写入失败的分块以及前 max_errors 条校验错误。
+    """
+    summary = {
+        "rows": 0, "inserted": 0, "invalid": 0, "duplicates": 0, "chunks": 0, "skipped_chunks": 0,
+        "failed_chunks": [], "errors": [],
+    }
+    start = time.monotonic()
+
+    def collect(result, rows):
+        summary["rows"] += result.rows
+        summary["chunks"] += 1
+        summary["inserted"] += result.inserted
+        summary["invalid"] += result.invalid
+        summary["duplicates"] += result.duplicates
+        if result.error is not None:
+            summary["failed_chunks"].append({
+                "chunk": result.index, "first_line": result.first_line, "last_line": result.last_line,
+                "error": result.error,
+            })
+        if on_chunk is not None:
+            on_chunk(result, rows)
+
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="ingest") if workers > 1 else None
+    pending = set()
+    try:
+        for index, chunk in enumerate(iter_chunks(records, chunk_size)):
+            if skip_chunks and index in skip_chunks:
+                summary["skipped_chunks"] += 1
+                continue
+            args = (engine, index, chunk, default_source, max_text_length, summary["errors"], max_errors, dedup)
+            if executor is None:
+                collect(*ingest_chunk(*args))
+                continue
+            pending.add(executor.submit(ingest_chunk, *args))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(*future.result())
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(*future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    summary["failed_chunks"].sort(key=lambda chunk: chunk["chunk"])
+    summary["seconds"] = time.monotonic() - start
+    return summary
@@ -0,0 +1,155 @@
+import os
+import time
+import traceback
+from contextlib import contextmanager
+from threading import Lock, Thread
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# gunicorn 多 worker 部署时设置 PROMETHEUS_MULTIPROC_DIR（见 gunicorn.conf.py），
+# 各进程把指标写入该目录，/metrics 汇总所有 worker 的数据
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# 请求耗时的分桶（秒），覆盖单条预测的毫秒级到批量导出的秒级
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "mlops_http_request_duration_seconds", "HTTP 请求耗时",
+    ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_LATENCY = Histogram(
+    "mlops_http_request_db_duration_seconds", "单个请求中 SQL 语句的总耗时",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Counter("mlops_http_request_db_queries", "请求中执行的 SQL 语句数", ["endpoint"])
+IN_FLIGHT = Gauge("mlops_http_requests_in_flight", "正在处理的请求数", multiprocess_mode="livesum")
+
+# 预测各阶段的耗时：vectorize 向量化，model_predict 模型推理，db_write 写入预测记录
+PREDICT_STAGE_LATENCY = Histogram(
+    "mlops_predict_stage_duration_seconds", "预测各阶段耗时",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+
+MODEL_CACHE_EVENTS = Counter("mlops_model_cache_events", "模型缓存事件（hits/misses/loads/load_errors/evictions）", ["event"])
+MODEL_CACHE_MODELS = Gauge("mlops_model_cache_models", "已加载的模型数", multiprocess_mode="livesum")
+MODEL_CACHE_BYTES = Gauge("mlops_model_cache_bytes", "已加载模型的估算内存（字节）", multiprocess_mode="livesum")
+PREDICT_CACHE_EVENTS = Counter(
+    "mlops_prediction_cache_events", "预测结果缓存事件（hits/misses/evictions/expirations/invalidations）", ["event"],
+)
+PREDICT_CACHE_ENTRIES = Gauge("mlops_prediction_cache_entries", "预测结果缓存的条数", multiprocess_mode="livesum")
+WRITE_BEHIND_PENDING = Gauge("mlops_write_behind_pending_rows", "等待异步写入的预测记录数", multiprocess_mode="livesum")
+
+# 重训练状态保存在共享的状态文件中，所有 worker 看到的是同一个值
+RETRAIN_STATUS = Gauge("mlops_retrain_status", "重训练任务状态，当前状态为1", ["status"], multiprocess_mode="max")
+RETRAIN_PENDING_ROWS = Gauge("mlops_retrain_pending_rows", "等待训练的新增行数", multiprocess_mode="max")
+RETRAIN_RUNS = Gauge("mlops_retrain_runs", "累计训练次数", multiprocess_mode="max")
+RETRAIN_LAST_DURATION = Gauge("mlops_retrain_last_duration_seconds", "上次训练耗时", multiprocess_mode="max")
+RETRAIN_STATUSES = ("idle", "queued", "running", "finished", "failed")
+
+
+@contextmanager
+def predict_stage(stage):
+    """统计一个预测阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PREDICT_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def observe_request(method, endpoint, status, seconds, queries=None, db_seconds=None):
+    """记录一次请求的耗时，以及请求中的 SQL 语句数和数据库耗时"""
+    REQUEST_LATENCY.labels(method, endpoint, str(status)).observe(seconds)
+    if queries is not None:
+        REQUEST_DB_QUERIES.labels(endpoint).inc(queries)
+        REQUEST_DB_LATENCY.labels(endpoint).observe(db_seconds)
+
+
+class StatsExporter:
+    """
+    把各组件 stats() 返回的累计计数同步为 Prometheus 指标。
+
+    计数器按两次同步之间的差值递增，因此多进程模式下各 worker 的计数可以直接相加。
+    /metrics 被请求时同步一次，start 启动的后台线程定期同步，
+    保证没有被 Prometheus 直接访问到的 worker 也会更新指标。
+
+    Args:
+        model_cache: ModelCache 对象。
+        predict_cache: PredictionCache 对象。
+        retrain_scheduler: RetrainScheduler 对象。
+        writer: WriteBehindWriter 对象，未开启异步写入时为 None。
+        interval (float): 后台同步的间隔（秒）。
+    """
+
+    def __init__(self, model_cache, predict_cache, retrain_scheduler, writer=None, interval=5):
+        self.model_cache = model_cache
+        self.predict_cache = predict_cache
+        self.retrain_scheduler = retrain_scheduler
+        self.writer = writer
+        self.interval = interval
+        self._last = {}
+        self._lock = Lock()
+        self._thread = None
+
+    def _inc(self, counter, name, event, value):
+        key = (name, event)
+        delta = value - self._last.get(key, 0)
+        if delta > 0:
+            counter.labels(event).inc(delta)
+        self._last[key] = value
+
+    def sync(self):
+        """读取各组件的当前状态并更新指标"""
+        with self._lock:
+            stats = self.model_cache.stats()
+            for event in ("hits", "misses", "loads", "load_errors", "evictions"):
+                self._inc(MODEL_CACHE_EVENTS, "model_cache", event, stats[event])
+            MODEL_CACHE_MODELS.set(len(stats["models"]))
+            MODEL_CACHE_BYTES.set(stats["model_bytes"])
+
+            stats = self.predict_cache.stats()
+            for event in ("hits", "misses", "evictions", "expirations", "invalidations"):
+                self._inc(PREDICT_CACHE_EVENTS, "predict_cache", event, stats[event])
+            PREDICT_CACHE_ENTRIES.set(stats["size"])
+
+            if self.writer is not None:
+                WRITE_BEHIND_PENDING.set(self.writer.stats()["pending_rows"])
+
+            state = self.retrain_scheduler.status()
+            for status in RETRAIN_STATUSES:
+                RETRAIN_STATUS.labels(status).set(1 if state["status"] == status else 0)
+            RETRAIN_PENDING_ROWS.set(state["pending_rows"])
+            RETRAIN_RUNS.set(state["runs"])
+            RETRAIN_LAST_DURATION.set(state["last_duration"] or 0)
+
+    def start(self):
+        """启动定期同步的后台线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.sync()
+                except Exception:
+                    traceback.print_exc()
+
+        self._thread = Thread(target=run, name="metrics-sync", daemon=True)
+        self._thread.start()
+
+
+def render():
+    """
+    生成 Prometheus 文本格式的指标。
+
+    Returns:
+        tuple: (响应体, Content-Type)。
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
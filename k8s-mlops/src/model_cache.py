@@ -0,0 +1,215 @@
+import pickle
+import time
+import traceback
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+
+from mlflow import MlflowClient
+
+# 可以作为模型版本使用的阶段名，会被解析为该阶段下的最新版本号
+STAGES = {"production": "Production", "staging": "Staging", "archived": "Archived", "none": "None"}
+
+
+def is_alias(ver):
+    """判断版本号是否为需要解析的别名：阶段名、latest 或 @别名"""
+    ver = str(ver)
+    return ver.lower() in STAGES or ver.lower() == "latest" or ver.startswith("@")
+
+
+def resolve_registry_version(name, ver):
+    """
+    通过 MLflow 模型注册表把别名解析为具体版本号。
+
+    Args:
+        name (str): 注册的模型名称。
+        ver (str): 阶段名（如 Production）、latest 或 @别名。
+
+    Returns:
+        str: 具体的版本号。
+    """
+    client = MlflowClient()
+    if ver.startswith("@"):
+        return str(client.get_model_version_by_alias(name, ver[1:]).version)
+    stages = None if ver.lower() == "latest" else [STAGES[ver.lower()]]
+    versions = client.get_latest_versions(name, stages=stages)
+    if not versions:
+        raise LookupError(f"No version of model '{name}' found for '{ver}'")
+    return str(max(int(v.version) for v in versions))
+
+
+def estimate_size(model):
+    """用序列化后的大小估算模型占用的内存，无法序列化时返回 0"""
+    # 自带数组大小的模型（如 CompactModel）直接使用，不必序列化
+    nbytes = getattr(model, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    try:
+        return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class _Flight:
+    """正在加载中的模型，同一模型的并发请求共享这一次加载"""
+
+    __slots__ = ("event", "model", "error")
+
+    def __init__(self):
+        self.event = Event()
+        self.model = None
+        self.error = None
+
+
+class ModelCache:
+    """
+    有容量上限的 LRU 模型缓存。
+
+    - 按 (模型名, 具体版本号) 缓存，超过 max_models 个或估算总大小超过 max_bytes 时
+      淘汰最久未使用的模型
+    - 同一个未加载的模型被并发请求时只加载一次，其余请求等待同一次加载的结果
+    - 阶段名、latest、@别名会被解析为具体版本号并缓存，后台线程每隔 alias_refresh 秒
+      重新解析，别名指向新版本时先加载新版本再切换
+
+    Args:
+        loader (callable): loader(name, version) -> 模型对象。
+        max_models (int): 最多缓存的模型数量。
+        max_bytes (int): 缓存模型的估算总大小上限（字节），0 表示不限制。
+        alias_refresh (float): 别名重新解析的间隔（秒）。
+        resolver (callable): resolver(name, alias) -> 具体版本号。
+        size_fn (callable): size_fn(model) -> 估算的字节数。
+        on_evict (callable): 模型被淘汰时以 (name, version) 调用，用于清理相关的缓存。
+    """
+
+    def __init__(self, loader, max_models=4, max_bytes=0, alias_refresh=60,
+                 resolver=resolve_registry_version, size_fn=estimate_size, on_evict=None):
+        self.loader = loader
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.alias_refresh = alias_refresh
+        self.resolver = resolver
+        self.size_fn = size_fn
+        self.on_evict = on_evict
+        self._models = OrderedDict()  # {(name, version): (model, size)}
+        self._loading = {}  # {(name, version): _Flight}
+        self._aliases = {}  # {(name, alias): (version, resolved_at)}
+        self._bytes = 0
+        self._lock = Lock()
+        self._counters = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "evictions": 0, "load_seconds": 0.0}
+        self._refresher = None
+
+    def resolve(self, name, ver):
+        """把别名解析为具体版本号，具体版本号原样返回"""
+        ver = str(ver)
+        if not is_alias(ver):
+            return ver
+        with self._lock:
+            cached = self._aliases.get((name, ver))
+        # 后台线程没有运行时，过期的解析结果在请求中同步刷新
+        if cached is not None and time.monotonic() - cached[1] < 2 * self.alias_refresh:
+            return cached[0]
+        version = self.resolver(name, ver)
+        with self._lock:
+            self._aliases[(name, ver)] = (version, time.monotonic())
+        return version
+
+    def get(self, name, ver):
+        """获取模型，未缓存时加载"""
+        key = (name, self.resolve(name, ver))
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[0]
+            self._counters["misses"] += 1
+            flight = self._loading.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._loading[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.model
+        return self._load(key, flight)
+
+    def _load(self, key, flight):
+        start = time.monotonic()
+        try:
+            model = self.loader(*key)
+            size = self.size_fn(model)
+        except Exception as e:
+            with self._lock:
+                self._counters["load_errors"] += 1
+                del self._loading[key]
+            flight.error = e
+            flight.event.set()
+            raise
+
+        with self._lock:
+            self._counters["loads"] += 1
+            self._counters["load_seconds"] += time.monotonic() - start
+            self._models[key] = (model, size)
+            self._bytes += size
+            del self._loading[key]
+            evicted = self._evict_locked(keep=key)
+        flight.model = model
+        flight.event.set()
+
+        for evicted_key in evicted:
+            if self.on_evict is not None:
+                self.on_evict(*evicted_key)
+        return model
+
+    def _evict_locked(self, keep):
+        evicted = []
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            _, size = self._models.pop(key)
+            self._bytes -= size
+            self._counters["evictions"] += 1
+            evicted.append(key)
+        return evicted
+
+    def refresh_aliases(self):
+        """重新解析所有用过的别名，指向新版本时先加载新版本再切换"""
+        with self._lock:
+            aliases = list(self._aliases.items())
+        for (name, alias), (version, _) in aliases:
+            try:
+                new_version = self.resolver(name, alias)
+                if new_version != version:
+                    self.get(name, new_version)
+                    print(f"Model alias {name}/{alias} moved from version {version} to {new_version}")
+            except Exception:
+                traceback.print_exc()
+                continue
+            with self._lock:
+                self._aliases[(name, alias)] = (new_version, time.monotonic())
+
+    def start_refresher(self):
+        """启动定期刷新别名的后台线程"""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.alias_refresh)
+                self.refresh_aliases()
+
+        self._refresher = Thread(target=run, name="model-alias-refresher", daemon=True)
+        self._refresher.start()
+
+    def stats(self):
+        """返回命中、加载、淘汰次数以及当前缓存的模型"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["models"] = [f"{name}/{version}" for name, version in self._models]
+            stats["model_bytes"] = self._bytes
+            stats["aliases"] = {f"{name}/{alias}": version for (name, alias), (version, _) in self._aliases.items()}
+        return stats
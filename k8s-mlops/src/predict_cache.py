@@ -0,0 +1,90 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def normalize_text(text):
+    """去掉首尾空白并把连续空白合并为一个空格，不影响分词结果"""
+    return " ".join(text.split())
+
+
+def text_key(text):
+    """规范化文本的128位摘要，作为缓存键的一部分，避免在内存中保存整条评论"""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+
+class PredictionCache:
+    """
+    预测结果的 LRU/TTL 缓存。
+
+    按 (模型名, 具体版本号, 规范化文本摘要) 缓存预测标签，重复的评论不再做向量化和推理。
+    超过 max_size 条时淘汰最久未使用的结果，写入超过 ttl 秒的结果视为过期。
+    版本号是缓存键的一部分，别名切换到新版本后自然不会命中旧结果；
+    模型被淘汰或其向量化器重新加载时调用 invalidate 清除对应版本的结果。
+
+    Args:
+        max_size (int): 最多缓存的结果条数，0 表示关闭缓存。
+        ttl (float): 结果的有效期（秒），0 表示不过期。
+    """
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._results = OrderedDict()  # {(name, version, text_key): (label, stored_at)}
+        self._lock = Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, name, ver, text):
+        """返回缓存的标签，未命中或已过期时返回 None"""
+        if not self.enabled:
+            return None
+        key = (name, str(ver), text_key(text))
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] >= self.ttl:
+                del self._results[key]
+                self._counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._results.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def put(self, name, ver, text, label):
+        """保存一条预测结果"""
+        if not self.enabled:
+            return
+        key = (name, str(ver), text_key(text))
+        with self._lock:
+            self._results[key] = (label, time.monotonic())
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, name, ver=None):
+        """清除某个模型（指定 ver 时只清除该版本）的全部结果"""
+        ver = None if ver is None else str(ver)
+        with self._lock:
+            keys = [key for key in self._results if key[0] == name and (ver is None or key[1] == ver)]
+            for key in keys:
+                del self._results[key]
+            self._counters["invalidations"] += len(keys)
+
+    def stats(self):
+        """返回命中、未命中、淘汰次数以及当前缓存的条数"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._results)
+        stats["max_size"] = self.max_size
+        stats["ttl"] = self.ttl
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
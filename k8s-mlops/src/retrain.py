@@ -0,0 +1,254 @@
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+from threading import Event, Lock, Thread
+
+# 以 python -m src.retrain 启动时，保证同目录下的模块可以直接导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RetrainScheduler:
+    """
+    后台重训练调度器。
+
+    新增数据只在内存中累加计数，后台线程定期把计数合并到持久化的状态文件。
+    auto 为 True 时，累计新增行数达到 min_rows，或距离上次训练超过 interval 秒且有新数据时，
+    把一次重训练任务放入队列；否则只有 request 会排队。队列中已有任务时新的触发会被合并，
+    排队的任务要等到连续 debounce 秒没有新数据（最多等待 max_delay 秒）才开始执行，
+    因此一批密集的插入只会引起一次重训练。
+
+    训练在 command 启动的子进程中执行，不占用 web worker 的 CPU 和 GIL，后台线程只等待其结束。
+    状态文件和文件锁保存在 state_dir 下，多进程部署时只有拿到 worker 锁的进程
+    会启动训练；stop 时结束正在运行的训练进程并把任务放回队列，
+    进程重启后未完成的任务会重新排队。
+
+    Args:
+        command (list): 执行一次完整训练的命令，见 run_pipeline。
+        state_dir (str): 状态文件和锁文件所在目录。
+        auto (bool): 是否按新增行数和时间间隔自动触发。
+        min_rows (int): 触发重训练的新增行数。
+        interval (float): 有新数据时两次训练之间的最长间隔（秒），0 表示不按时间触发。
+        debounce (float): 开始训练前要求的无新数据静默时间（秒）。
+        max_delay (float): 任务排队后最长的等待时间（秒）。
+        poll (float): 后台线程检查状态的间隔（秒）。
+    """
+
+    def __init__(self, command, state_dir, auto=False, min_rows=1000, interval=3600, debounce=5.0, max_delay=60.0,
+                 poll=1.0):
+        self.command = command
+        self.state_dir = state_dir
+        self.auto = auto
+        self.min_rows = min_rows
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll = poll
+        self.state_path = os.path.join(state_dir, "retrain_state.json")
+        self._state_lock_path = os.path.join(state_dir, "retrain_state.lock")
+        self._worker_lock_path = os.path.join(state_dir, "retrain_worker.lock")
+        self._worker_lock_file = None
+        self._new_rows = 0
+        self._force = False
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+        self._process = None
+
+    def start(self):
+        """启动后台线程，重复调用无副作用"""
+        if self._thread is not None:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._thread = Thread(target=self._run, name="retrain-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止后台线程，正在运行的训练进程被结束，任务放回队列由之后的进程重新执行"""
+        self._stop.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record_rows(self, n=1):
+        """记录新增的数据行数，只更新内存计数，不访问磁盘"""
+        with self._lock:
+            self._new_rows += n
+
+    def request(self):
+        """手动请求一次重训练，已有排队任务时会被合并"""
+        with self._lock:
+            self._force = True
+
+    def status(self):
+        """返回当前的调度状态"""
+        with self._lock:
+            unflushed = self._new_rows
+        state = self._load_state()
+        state["pending_rows"] += unflushed
+        state["auto"] = self.auto
+        state["min_rows"] = self.min_rows
+        state["interval"] = self.interval
+        return state
+
+    def _default_state(self):
+        # status 取值：idle 空闲，queued 已排队，running 训练中，finished 已完成，failed 失败
+        return {
+            "status": "idle",
+            "pending_rows": 0,
+            "queued_at": None,
+            "last_row_at": None,
+            "started_at": None,
+            "finished_at": None,
+            "last_duration": None,
+            "last_error": None,
+            "runs": 0,
+        }
+
+    def _load_state(self):
+        state = self._default_state()
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        return state
+
+    def _save_state(self, state):
+        # 先写临时文件再替换，保证状态文件不会出现写了一半的内容
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _update_state(self, fn):
+        """在跨进程文件锁内读-改-写状态文件"""
+        with open(self._state_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = self._load_state()
+                before = dict(state)
+                fn(state)
+                # 状态没有变化时不重写文件
+                if state != before:
+                    self._save_state(state)
+                return state
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire_worker_lock(self):
+        """尝试成为唯一执行训练的进程，锁在进程存活期间一直持有"""
+        if self._worker_lock_file is not None:
+            return True
+        lock_file = open(self._worker_lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._worker_lock_file = lock_file
+
+        # 上一个 worker 在训练中退出，把任务重新放回队列
+        self._update_state(self._requeue)
+        return True
+
+    def _merge_and_trigger(self, state):
+        with self._lock:
+            new_rows, force = self._new_rows, self._force
+            self._new_rows, self._force = 0, False
+        now = time.time()
+        if new_rows:
+            state["pending_rows"] += new_rows
+            state["last_row_at"] = now
+        if state["status"] in ("queued", "running"):
+            # 已有任务在排队或运行，新的触发与其合并
+            return
+        # 从未训练过时，以调度器第一次记录状态的时间作为起点
+        last = state["finished_at"] or state.setdefault("since", now)
+        due = force or self.auto and (
+            state["pending_rows"] >= self.min_rows
+            or (self.interval and state["pending_rows"] > 0 and now - last >= self.interval)
+        )
+        if due:
+            state["status"] = "queued"
+            state["queued_at"] = now
+
+    def _claim(self, state):
+        now = time.time()
+        quiet = state["last_row_at"] is None or now - state["last_row_at"] >= self.debounce
+        if state["status"] == "queued" and (quiet or now - state["queued_at"] >= self.max_delay):
+            state["status"] = "running"
+            state["started_at"] = now
+            # 本次训练会覆盖到目前为止的所有数据
+            state["pending_rows"] = 0
+
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            try:
+                state = self._update_state(self._merge_and_trigger)
+                if state["status"] != "queued" or not self._acquire_worker_lock():
+                    continue
+                state = self._update_state(self._claim)
+                if state["status"] != "running":
+                    continue
+                self._train()
+            except Exception:
+                traceback.print_exc()
+
+    def _train(self):
+        start = time.time()
+        error = None
+        try:
+            self._process = subprocess.Popen(self.command)
+            # 等待训练进程结束；stop 会结束该进程
+            while self._process.poll() is None:
+                self._stop.wait(self.poll)
+            if self._stop.is_set():
+                try:
+                    self._process.wait(10)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+                    self._process.wait()
+                self._update_state(self._requeue)
+                return
+            if self._process.returncode != 0:
+                error = f"training process exited with code {self._process.returncode}"
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._process = None
+
+        def finish(state):
+            state["status"] = "failed" if error else "finished"
+            state["finished_at"] = time.time()
+            state["last_duration"] = state["finished_at"] - start
+            state["last_error"] = error
+            state["runs"] += 1
+
+        self._update_state(finish)
+
+    @staticmethod
+    def _requeue(state):
+        if state["status"] == "running":
+            state["status"] = "queued"
+
+
+def run_pipeline():
+    """执行一次完整的训练流程：预处理、生成特征、训练并注册模型"""
+    import train_embed
+    import train_pre_csv
+    import train_svm
+
+    train_pre_csv.main()
+    train_embed.main()
+    train_svm.main()
+
+
+if __name__ == "__main__":
+    run_pipeline()
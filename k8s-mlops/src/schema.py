@@ -0,0 +1,20 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+
+# alembic.ini 位于项目根目录（src 的上一级）
+ALEMBIC_INI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def upgrade_schema(database_uri, revision="head"):
+    """
+    执行数据库迁移，把表结构和索引升级到指定版本。
+
+    Args:
+        database_uri (str): 数据库连接地址。
+        revision (str): 目标迁移版本，默认为最新版本。
+    """
+    config = Config(ALEMBIC_INI_PATH)
+    config.set_main_option("sqlalchemy.url", database_uri)
+    command.upgrade(config, revision)
@@ -0,0 +1,193 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+
+
+def tokenize_and_remove_stopwords(text, stopwords):
+    """使用jieba分词并移除停用词，返回以空格分隔的词"""
+    tokens = jieba.cut(text)
+    filtered_tokens = [
+        token for token in tokens if token not in stopwords and token.strip() != ""
+    ]
+    cleaned_text = " ".join(filtered_tokens)
+    # 清理前后以及中间的多余空格
+    return " ".join(cleaned_text.split())
+
+
+# 工作进程中的停用词集合，由 _init_worker 设置，避免随每个分块重复传递
+_worker_stopwords = None
+
+
+def _init_worker(stopwords):
+    global _worker_stopwords
+    _worker_stopwords = stopwords
+    # 每个工作进程启动时加载一次jieba词典
+    jieba.initialize()
+
+
+def _pool_context():
+    """
+    进程池的启动方式。重训练可能在 gunicorn worker 的后台线程中运行，多线程进程中 fork
+    只复制调用线程，其他线程持有的锁（日志、数据库连接池等）在子进程中无法释放，可能死锁；
+    因此使用 forkserver（不支持的平台上使用 spawn），工作进程不继承父进程的状态。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _segment_chunk(texts):
+    return [tokenize_and_remove_stopwords(text, _worker_stopwords) for text in texts]
+
+
+def segment_texts(texts, stopwords, workers=1, chunk_size=5000, min_parallel_rows=50000):
+    """
+    对一组文本分词并去除停用词。
+
+    workers 大于1且文本数不少于 min_parallel_rows 时，把文本按 chunk_size 切分后交给进程池处理，
+    否则在当前进程中逐条处理（少量文本时启动进程和传输数据的开销大于并行的收益）。
+    两种方式的结果相同，并与输入的顺序一一对应。工作进程不继承父进程的状态（见 _pool_context），
+    在当前进程中用 jieba.add_word 等加入的词在进程池中不生效。
+
+    Args:
+        texts (iterable): 待分词的文本。
+        stopwords (set): 停用词集合。
+        workers (int): 进程数，0 或负数表示使用全部 CPU。
+        chunk_size (int): 每个任务包含的文本数。
+        min_parallel_rows (int): 使用进程池的最少文本数。
+
+    Returns:
+        list: 与 texts 顺序一致的分词结果。
+    """
+    texts = list(texts)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(texts) < min_parallel_rows:
+        return [tokenize_and_remove_stopwords(text, stopwords) for text in texts]
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    segmented = []
+    with ProcessPoolExecutor(
+        workers, mp_context=_pool_context(), initializer=_init_worker, initargs=(stopwords,)
+    ) as executor:
+        # map 按提交顺序返回结果
+        for result in executor.map(_segment_chunk, chunks):
+            segmented.extend(result)
+    return segmented
+
+
+def text_digest(text):
+    """文本的128位摘要，作为分词缓存的键"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def file_digest(path):
+    """文件内容的摘要（十六进制），用于识别停用词文件是否变化"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SegmentationCache:
+    """
+    保存在 SQLite 文件中的分词结果缓存：(停用词文件摘要, 文本摘要) -> word_seg。
+
+    停用词文件变化后摘要不同，旧的结果不会再被命中；打开缓存时删除其他摘要下的结果，
+    避免文件随停用词的修改不断增长。缓存只在当前进程中使用，分词的工作进程不访问它。
+
+    Args:
+        path (str): SQLite 文件路径，所在目录不存在时自动创建。
+        stopwords_digest (str): 停用词文件的摘要，见 file_digest。
+        batch_size (int): 每条查询语句包含的键数，需小于 SQLite 的参数个数上限。
+    """
+
+    def __init__(self, path, stopwords_digest, batch_size=500):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.stopwords_digest = stopwords_digest
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segmentation ("
+            "stopwords_digest TEXT NOT NULL, text_digest BLOB NOT NULL, word_seg TEXT NOT NULL, "
+            "PRIMARY KEY (stopwords_digest, text_digest)) WITHOUT ROWID"
+        )
+        with self._conn:
+            self._conn.execute("DELETE FROM segmentation WHERE stopwords_digest != ?", (stopwords_digest,))
+
+    @classmethod
+    def for_stopwords_file(cls, path, stopwords_txt_path, **kwargs):
+        """以停用词文件当前内容的摘要打开缓存"""
+        return cls(path, file_digest(stopwords_txt_path), **kwargs)
+
+    def get_many(self, digests):
+        """返回 {文本摘要: word_seg}，只包含已缓存的文本"""
+        found = {}
+        for i in range(0, len(digests), self.batch_size):
+            batch = digests[i:i + self.batch_size]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_digest, word_seg FROM segmentation "
+                f"WHERE stopwords_digest = ? AND text_digest IN ({placeholders})",
+                [self.stopwords_digest, *batch],
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, items):
+        """写入 [(文本摘要, word_seg)]"""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segmentation (stopwords_digest, text_digest, word_seg) VALUES (?, ?, ?)",
+                ((self.stopwords_digest, digest, word_seg) for digest, word_seg in items),
+            )
+
+    def __len__(self):
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM segmentation WHERE stopwords_digest = ?", (self.stopwords_digest,)
+        ).fetchone()[0]
+
+    def stats(self):
+        return {"path": self.path, "entries": len(self), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._conn.close()
+
+
+def segment_texts_cached(texts, stopwords, cache, **kwargs):
+    """
+    与 segment_texts 相同，但先查询分词缓存，只对未缓存的文本分词并写回缓存。
+    重复的文本只分词一次。cache 为 None 时等同于 segment_texts。
+
+    Args:
+        texts (iterable): 待分词的文本。
+        stopwords (set): 停用词集合，须与打开 cache 时使用的停用词文件一致。
+        cache (SegmentationCache): 分词缓存。
+        **kwargs: 传给 segment_texts 的 workers、chunk_size、min_parallel_rows。
+    """
+    if cache is None:
+        return segment_texts(texts, stopwords, **kwargs)
+    texts = list(texts)
+    digests = [text_digest(text) for text in texts]
+    unique = {}
+    for digest, text in zip(digests, texts):
+        unique.setdefault(digest, text)
+
+    found = cache.get_many(list(unique))
+    missing = [digest for digest in unique if digest not in found]
+    if missing:
+        segmented = segment_texts([unique[digest] for digest in missing], stopwords, **kwargs)
+        new_items = list(zip(missing, segmented))
+        cache.put_many(new_items)
+        found.update(new_items)
+    cache.hits += len(unique) - len(missing)
+    cache.misses += len(missing)
+    return [found[digest] for digest in digests]
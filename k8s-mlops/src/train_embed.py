@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 # import torch
 # from transformers import BertModel, BertTokenizer
@@ -6,38 +5,115 @@ import os
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.decomposition import TruncatedSVD
 from sklearn.preprocessing import StandardScaler
-from joblib import dump
+from joblib import dump, load
+
+import sys
+# 以 python -m src.train_embed 启动时，保证同目录下的模块可以直接导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from comment_store import comments_path, read_comments
+from segmentation import text_digest
 
 BASE_PATH = os.environ["BASE_PATH"]
+# 与 dataset.py 读取的路径一致
+VECTORIZER_PATH = os.environ.get("VECTORIZER_PATH", "/root/data/model/tfidf_vectorizer.joblib")
+SVD_PATH = os.environ.get("SVD_PATH", "/root/data/model/svd.joblib")
 
-def vectorize_comments(comments_file_path, output_path):
-    """
-    使用TF-IDF方法将评论文本转换为向量形式，并进行降维处理。
+# 与 train_pre_csv 的增量模式使用同一个开关：沿用上次拟合的TF-IDF和SVD，只为新增或文本变化的评论计算嵌入，
+# 需要计算的评论超过上次拟合时评论数的 EMBED_REFIT_FRACTION 时重新拟合
+EMBED_INCREMENTAL = os.environ.get("PREPROCESS_INCREMENTAL", "0") == "1"
+EMBED_REFIT_FRACTION = float(os.environ.get("EMBED_REFIT_FRACTION", "0.2"))
+EMBED_STORE_PATH = os.environ.get("EMBED_STORE_PATH", f"{BASE_PATH}/feature_store/embeddings.npz")
 
-    Args:
-        comments_file_path (str): 包含评论文本的CSV文件路径。
-        output_path (str): 向量化结果将被保存的路径。
+
+def fit_embeddings(texts):
+    """
+    拟合TF-IDF向量化器和SVD，保存两者并返回评论的嵌入向量。
     """
-    # 读取评论数据
-    df = pd.read_csv(comments_file_path)
     # 初始化TF-IDF向量化器
     tfidf_vectorizer = TfidfVectorizer(max_features=500)
-    tfidf_matrix = tfidf_vectorizer.fit_transform(df['reply'])
-    
+    tfidf_matrix = tfidf_vectorizer.fit_transform(texts)
+
     # 保存TF-IDF向量化器
-    dump(tfidf_vectorizer, f'/root/data/model/tfidf_vectorizer.joblib')
-    
+    dump(tfidf_vectorizer, VECTORIZER_PATH)
+
     # 确定SVD的组件数
     # n_components = min(50, tfidf_matrix.shape[1] - 1)
     n_components = 86
-    
+
     # 使用SVD进行降维处理
     svd = TruncatedSVD(n_components=n_components)
     char_embeds = svd.fit_transform(tfidf_matrix)
-    
+
     # 保存SVD模型
-    dump(svd, f'/root/data/model/svd.joblib')
-    
+    dump(svd, SVD_PATH)
+    return char_embeds
+
+
+def save_embedding_store(ids, digests, char_embeds, fit_rows):
+    """
+    保存每条评论的 id、文本摘要和嵌入向量，以及拟合时的评论数，先写临时文件再替换。
+    摘要保存为 uint8 矩阵（定长字节串类型会去掉末尾的0字节）。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(EMBED_STORE_PATH)), exist_ok=True)
+    tmp_path = f"{EMBED_STORE_PATH}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, ids=ids, digests=np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(-1, 16), embeddings=char_embeds, fit_rows=fit_rows)
+    os.replace(tmp_path, EMBED_STORE_PATH)
+
+
+def embed_incremental(df):
+    """
+    增量计算嵌入：id 和文本都没有变化的评论直接使用保存的嵌入，其余评论用上次拟合的
+    向量化器和SVD计算；没有保存的结果，或需要计算的评论过多时重新拟合。
+
+    Args:
+        df (DataFrame): 包含 id 和 reply 列的评论数据。
+
+    Returns:
+        ndarray: 与 df 行顺序一致的嵌入向量。
+    """
+    ids = df['id'].to_numpy()
+    digests = [text_digest(text) for text in df['reply']]
+    if os.path.exists(EMBED_STORE_PATH) and os.path.exists(VECTORIZER_PATH) and os.path.exists(SVD_PATH):
+        with np.load(EMBED_STORE_PATH) as store:
+            stored_ids, stored_digests = store["ids"], store["digests"]
+            embeddings, fit_rows = store["embeddings"], int(store["fit_rows"])
+        known = {key: i for i, key in enumerate(zip(stored_ids.tolist(), map(bytes, stored_digests)))}
+        positions = np.array([known.get(key, -1) for key in zip(ids.tolist(), digests)], dtype=np.int64)
+        missing = positions < 0
+        if missing.sum() <= EMBED_REFIT_FRACTION * fit_rows:
+            vectorizer, svd = load(VECTORIZER_PATH), load(SVD_PATH)
+            char_embeds = np.empty((len(df), embeddings.shape[1]))
+            char_embeds[~missing] = embeddings[positions[~missing]]
+            if missing.any():
+                char_embeds[missing] = svd.transform(vectorizer.transform(df['reply'][missing]))
+            save_embedding_store(ids, digests, char_embeds, fit_rows)
+            print(f"Embeddings: {int((~missing).sum())} reused, {int(missing.sum())} computed with the existing fit")
+            return char_embeds
+        print(f"Embeddings: {int(missing.sum())} new or changed comments, refitting TF-IDF and SVD")
+
+    char_embeds = fit_embeddings(df['reply'])
+    save_embedding_store(ids, digests, char_embeds, len(df))
+    return char_embeds
+
+
+def vectorize_comments(comments_file_path, output_path, incremental=False):
+    """
+    使用TF-IDF方法将评论文本转换为向量形式，并进行降维处理。
+
+    Args:
+        comments_file_path (str): 包含评论文本的预处理结果文件路径（Parquet 或 CSV）。
+        output_path (str): 向量化结果将被保存的路径。
+        incremental (bool): 为 True 时见 embed_incremental，否则每次重新拟合。
+    """
+    if incremental:
+        char_embeds = embed_incremental(read_comments(comments_file_path, columns=['id', 'reply']))
+    else:
+        # 读取评论数据
+        df = read_comments(comments_file_path, columns=['reply'])
+        char_embeds = fit_embeddings(df['reply'])
+
     # 保存向量化结果到CSV文件
     np.savetxt(output_path, char_embeds, delimiter=",")
 
@@ -49,12 +125,12 @@ def weight_and_save(char_embeds_path, scores_path, output_path):
 
     Args:
         char_embeds_path (str): 字符嵌入向量文件路径。
-        scores_path (str): 包含情感分数的文件路径。
+        scores_path (str): 包含情感分数的预处理结果文件路径（Parquet 或 CSV）。
         output_path (str): 加权字符嵌入将被保存的路径。
     """
     # 加载字符嵌入向量和情感分数
     char_embeds = np.loadtxt(char_embeds_path, delimiter=",")
-    normalized_scores = pd.read_csv(scores_path, usecols=["senti-z-score"]).to_numpy()
+    normalized_scores = read_comments(scores_path, columns=["senti-z-score"]).to_numpy()
     
     # 根据情感分数加权字符嵌入
     senti_embed = char_embeds * normalized_scores
@@ -72,15 +148,15 @@ def main():
         os.makedirs(output_dir)
         
     # 初始化路径
-    comments_path = f"{BASE_PATH}/comment_output/comments_cleaned.csv"
+    comments_file_path = comments_path(BASE_PATH)
     vectorized_path = f"{BASE_PATH}/char/embedding_char.csv"
     output_path = f"{BASE_PATH}/char/weighted_embeddings.csv" 
 
     # 将评论文本向量化
-    vectorize_comments(comments_path, vectorized_path)
+    vectorize_comments(comments_file_path, vectorized_path, incremental=EMBED_INCREMENTAL)
     
     # 使用情感分数加权向量化结果，并保存
-    weight_and_save(vectorized_path, comments_path, output_path)
+    weight_and_save(vectorized_path, comments_file_path, output_path)
 
 
 if __name__ == "__main__":
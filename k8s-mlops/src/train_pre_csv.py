@@ -1,118 +1,202 @@
 import pandas as pd
-import jieba
 from scipy.stats import zscore
 import numpy as np
 import os
+import time
 
 import mlflow
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, text
+
+import sys
+# 以 python -m src.train_pre_csv 启动时，保证同目录下的模块可以直接导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from comment_store import COMMENTS_CSV, COMMENTS_DIR, COMMENTS_PARQUET, write_comments
+from feature_store import FEATURE_COLUMNS, FeatureStore, RunningStats
+from segmentation import SegmentationCache, file_digest, segment_texts_cached
 
 
 BASE_PATH = os.environ["BASE_PATH"]
 DB_URI = os.environ["DATABASE_URL"]
 mlflow.tracking.set_tracking_uri(os.environ["TRACKING_URL"])
 
+# 为 1 时在内存中用同一个 DataFrame 依次执行所有预处理步骤，只在最后写一次 Parquet 文件；
+# 为 0 时沿用逐步读写 comments_cleaned.csv 的方式
+PREPROCESS_PIPELINE = os.environ.get("PREPROCESS_PIPELINE", "1") == "1"
 
-def get_clean_comments(output_file_path):
+# jieba分词的进程数，默认为1（单进程），0 表示使用全部 CPU；
+# 评论数少于 SEGMENT_MIN_PARALLEL_ROWS 时始终在当前进程中分词
+SEGMENT_WORKERS = int(os.environ.get("SEGMENT_WORKERS", "1"))
+SEGMENT_CHUNK_SIZE = int(os.environ.get("SEGMENT_CHUNK_SIZE", "5000"))
+SEGMENT_MIN_PARALLEL_ROWS = int(os.environ.get("SEGMENT_MIN_PARALLEL_ROWS", "50000"))
+
+# 分词结果缓存：以文本摘要和停用词文件摘要为键保存 word_seg，重训练时只对新增的文本分词
+SEGMENT_CACHE = os.environ.get("SEGMENT_CACHE", "1") == "1"
+SEGMENT_CACHE_PATH = os.environ.get("SEGMENT_CACHE_PATH", f"{BASE_PATH}/cache/segmentation.sqlite")
+
+# 为 1 时增量处理：只对上次处理之后新增或修改的评论计算逐行特征，保存在特征库中，
+# 文本和emoji情感分数的Z-score由累计的统计量计算。增量模式处理 dataset 表中的全部评论
+PREPROCESS_INCREMENTAL = os.environ.get("PREPROCESS_INCREMENTAL", "0") == "1"
+FEATURE_STORE_PATH = os.environ.get("FEATURE_STORE_PATH", f"{BASE_PATH}/feature_store/features.parquet")
+
+
+def filter_comments(df):
+    """
+    把 dataset 表中读出的行转换为后续处理使用的列名，并只保留长度在3到40字符之间的评论。
+
+    Returns:
+        DataFrame: 包含 reply（评论文本）和 is_troll（标签）等列。
+    """
+    # 重命名列以符合后续处理
+    df.rename(columns={"text": "reply", "label": "is_troll"}, inplace=True)
+    # label 在表中为字符串，转换为整数，与从CSV读回时的类型一致（train_svm 按整数标签计算指标）
+    df["is_troll"] = pd.to_numeric(df["is_troll"])
+
+    # 筛选出长度在3到40字符之间的评论
+    # 后续步骤会在结果上添加列，复制一份，避免修改筛选前的 DataFrame
+    return df[df['reply'].apply(lambda x: 3 <= len(x) <= 40)].copy()
+
+
+def load_clean_comments():
+    """从数据库读取评论，并只保留长度在3到40字符之间的评论"""
+    engine = create_engine(DB_URI)
     try:
-        engine = create_engine(DB_URI)
         # 从数据库中读取数据
         df = pd.read_sql("SELECT * FROM dataset limit 100", engine)
+    finally:
         engine.dispose()
+    return filter_comments(df)
 
-        # 重命名列以符合后续处理
-        df.rename(columns={"text": "reply", "label": "is_troll"}, inplace=True)
 
-        # 筛选出长度在3到40字符之间的评论
-        df = df[df['reply'].apply(lambda x: 3 <= len(x) <= 40)]
+def load_changed_comments(engine, max_id, max_create_time):
+    """
+    读取上次处理之后新增或修改的行：id 大于 max_id，或 create_time 不早于 max_create_time
+    （修改数据时会更新 create_time）。create_time 只精确到秒，等于 max_create_time 的行
+    可能已经处理过，会被重新处理一次。
+    """
+    if max_create_time is None:
+        query = text("SELECT * FROM dataset WHERE id > :max_id")
+    else:
+        query = text("SELECT * FROM dataset WHERE id > :max_id OR create_time >= :max_create_time")
+    return pd.read_sql(query, engine, params={"max_id": max_id, "max_create_time": max_create_time})
+
+
+def load_comments_by_id(engine, ids, batch_size=1000):
+    """按 id 读取行，每条查询最多包含 batch_size 个 id"""
+    query = text("SELECT * FROM dataset WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+    ids = [int(i) for i in ids]
+    frames = [
+        pd.read_sql(query, engine, params={"ids": ids[i:i + batch_size]}) for i in range(0, len(ids), batch_size)
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def get_clean_comments(output_file_path):
+    try:
+        df = load_clean_comments()
 
         # 保存处理后的数据到CSV文件
-        df.to_csv(output_file_path, index=False)
+        write_comments(df, output_file_path)
         print(f"Cleaned data saved to {output_file_path}")
     except Exception as e:
         print(f"An error occurred: {e}")
 
 
+def load_stopwords(stopwords_txt_path):
+    """加载停用词列表，返回停用词集合"""
+    with open(stopwords_txt_path, "r", encoding="utf-8") as f:
+        return set([line.strip() for line in f.readlines()])
+
 
-def seg_rmStpw(input_output_csv_path, stopwords_txt_path):
+def load_dictionary(dict_path, separator=","):
+    """根据词典文件的格式加载词典，返回一个字典"""
+    try:
+        with open(dict_path, "r", encoding="utf-8") as file:
+            if separator == " ":
+                return {
+                    line.split(separator)[0]: float(
+                        line.split(separator)[1].strip()
+                    )
+                    for line in file
+                    if line.strip()
+                }
+            else:
+                return {
+                    line.strip().split(separator)[0]: float(
+                        line.strip().split(separator)[1]
+                    )
+                    for line in file
+                    if separator in line
+                }
+    except Exception as e:
+        print(f"Error loading dictionary from {dict_path}: {e}")
+        return {}
+
+
+def load_sentiment_dictionaries(sen_dict_path, neg_dict_path, adv_dict_path):
     """
-    使用jieba进行中文分词并去除停用词。
+    加载情感词典、否定词词典和副词词典，情感词典使用空格分隔（根据词典的实际格式加载词典）。
 
-    Args:
-        input_output_csv_path (str): 输入和输出使用同一个CSV文件的路径，该文件包含需要处理的评论。
-        stopwords_txt_path (str): 停用词列表的文本文件路径。
+    Returns:
+        tuple: (sen_dict, neg_dict, adv_dict)。
     """
-    # 读取CSV文件
-    df = pd.read_csv(input_output_csv_path)
+    return (
+        load_dictionary(sen_dict_path, separator=" "),
+        load_dictionary(neg_dict_path),
+        load_dictionary(adv_dict_path),
+    )
 
-    # 加载停用词
-    with open(stopwords_txt_path, "r", encoding="utf-8") as f:
-        stopwords = set([line.strip() for line in f.readlines()])
-
-    # 分词并移除停用词
-    def tokenize_and_remove_stopwords(text):
-        tokens = jieba.cut(text)
-        filtered_tokens = [
-            token for token in tokens if token not in stopwords and token.strip() != ""
-        ]
-        cleaned_text = " ".join(filtered_tokens)
-        # 清理前后以及中间的多余空格
-        return " ".join(cleaned_text.split())
-
-    # 应用到每一行的中文文本列
-    df["word_seg"] = df["reply"].apply(tokenize_and_remove_stopwords)
-
-    # 保存到新的CSV文件
-    df.to_csv(input_output_csv_path, index=False)
 
+def load_emoji_scores(emoji_data_path):
+    """根据emoji的正面、中性、负面次数计算每个emoji的综合情感得分，返回 {emoji: 得分}"""
+    emoji_df = pd.read_csv(emoji_data_path)
+    emoji_scores = {}
+    for _, row in emoji_df.iterrows():
+        total = row["Negative"] + row["Neutral"] + row["Positive"]
+        # 计算综合情感得分
+        score = (
+            (1 * row["Positive"] / total)
+            - (1.2 * row["Negative"] / total)
+            + (0.5 * row["Neutral"] / total)
+        )
+        emoji_scores[row["Emoji"]] = score
+    return emoji_scores
 
-def calculate_sentiment_score_and_normalize(
-    input_output_csv_path, sen_dict_path, neg_dict_path, adv_dict_path
-):
+
+def open_segment_cache(stopwords_txt_path):
+    """SEGMENT_CACHE 开启时按停用词文件打开分词缓存，否则返回 None"""
+    if not SEGMENT_CACHE:
+        return None
+    return SegmentationCache.for_stopwords_file(SEGMENT_CACHE_PATH, stopwords_txt_path)
+
+
+def segment_comments(df, stopwords, workers=None, cache=None):
     """
-    计算评论的情感分数，并根据提供的情感、否定词和副词词典进行加权。
+    使用jieba对 reply 列进行中文分词并去除停用词，结果写入 word_seg 列。
 
     Args:
-        input_output_csv_path (str): 输入和输出使用同一个CSV文件的路径，该文件包含已分词的评论。
-        sen_dict_path (str): 情感词典的文件路径。
-        neg_dict_path (str): 否定词词典的文件路径。
-        adv_dict_path (str): 副词词典的文件路径。
+        df (DataFrame): 包含 reply 列的评论数据，原地修改。
+        stopwords (set): 停用词集合。
+        workers (int): 分词进程数，默认为 SEGMENT_WORKERS。
+        cache (SegmentationCache): 分词缓存，提供时只对未缓存的评论分词。
     """
+    df["word_seg"] = segment_texts_cached(
+        df["reply"],
+        stopwords,
+        cache,
+        workers=SEGMENT_WORKERS if workers is None else workers,
+        chunk_size=SEGMENT_CHUNK_SIZE,
+        min_parallel_rows=SEGMENT_MIN_PARALLEL_ROWS,
+    )
+    if cache is not None:
+        print(f"Segmentation cache: {cache.hits} hits, {cache.misses} misses")
+    return df
 
-    def load_dictionary(dict_path, separator=","):
-        """根据词典文件的格式加载词典，返回一个字典"""
-        try:
-            with open(dict_path, "r", encoding="utf-8") as file:
-                if separator == " ":
-                    return {
-                        line.split(separator)[0]: float(
-                            line.split(separator)[1].strip()
-                        )
-                        for line in file
-                        if line.strip()
-                    }
-                else:
-                    return {
-                        line.strip().split(separator)[0]: float(
-                            line.strip().split(separator)[1]
-                        )
-                        for line in file
-                        if separator in line
-                    }
-        except Exception as e:
-            print(f"Error loading dictionary from {dict_path}: {e}")
-            return {}
-
-    # 加载词典，情感词典使用空格分隔（根据词典的实际格式加载词典）
-    sen_dict = load_dictionary(sen_dict_path, separator=" ")
-    neg_dict = load_dictionary(neg_dict_path)
-    adv_dict = load_dictionary(adv_dict_path)
-
-    # 读取评论数据
-    comments_df = pd.read_csv(input_output_csv_path)
 
+def add_text_sentiment_scores(df, sen_dict, neg_dict, adv_dict):
+    """根据情感词典、否定词和副词计算已分词评论的文本情感分数，写入 t-score 列"""
     # 确保word_seg列是字符串类型，并处理NaN值
-    comments_df["word_seg"] = comments_df["word_seg"].fillna("").astype(str)
+    df["word_seg"] = df["word_seg"].fillna("").astype(str)
 
     def sentiment_analysis(row):
         words = row.split()
@@ -134,9 +218,123 @@ def calculate_sentiment_score_and_normalize(
         score += pending_score
         return score
 
-    comments_df["t-score"] = comments_df["word_seg"].apply(sentiment_analysis)
+    df["t-score"] = df["word_seg"].apply(sentiment_analysis)
+    return df
+
+
+def add_emoji_sentiment_scores(df, emoji_scores):
+    """根据 {emoji: 得分} 计算每条评论中emoji的情感得分之和，写入 e-score 列"""
+    # 确保word_seg列中的所有项都是字符串，并处理NaN值
+    df["word_seg"] = df["word_seg"].astype(str).fillna("")
+
+    # 定义计算emoji情感得分的函数
+    def emoji_sentiment_score(word_seg):
+        score = 0.0
+        words = word_seg.split()  # 现在word_seg已经保证是字符串类型
+        for word in words:
+            if word in emoji_scores:
+                score += emoji_scores[word]
+        return score
+
+    df["e-score"] = df["word_seg"].apply(emoji_sentiment_score)
+    return df
+
+
+def add_final_sentiment_scores(df):
+    """
+    根据文本情感分数和emoji情感分数的Z-score计算最终情感分数，写入 senti-score 列。
 
-    # 保存到新的CSV文件
+    按列向量化计算，结果与逐行计算相同：两者都非负时取加权和的平方根，都为负时取加权和，
+    符号不同时取 t/e 乘以加权和绝对值的平方根（e 为0时与逐行计算一样得到无穷大）。
+    """
+    t_z_score = df["t-z-score"].to_numpy(dtype=float)
+    e_z_score = df["e-z-score"].to_numpy(dtype=float)
+    weighted = 0.7 * t_z_score + 0.3 * e_z_score
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final_score = np.where(
+            (t_z_score >= 0) & (e_z_score >= 0),
+            np.sqrt(np.abs(weighted)),
+            np.where(
+                (t_z_score < 0) & (e_z_score < 0),
+                weighted,
+                (t_z_score / e_z_score) * np.sqrt(np.abs(weighted)),
+            ),
+        )
+    df["senti-score"] = final_score
+    return df
+
+
+def add_zscore(df, column, output_column):
+    """对 column 列进行Z-score标准化处理，结果写入 output_column 列"""
+    df[output_column] = zscore(df[column])
+    return df
+
+
+def preprocess_comments(df, stopwords, sen_dict, neg_dict, adv_dict, emoji_scores, segment_cache=None):
+    """
+    在内存中对同一个 DataFrame 依次执行所有预处理步骤：
+    分词去停用词、文本情感分数及其Z-score、emoji情感分数及其Z-score、最终情感分数及其Z-score。
+
+    Args:
+        df (DataFrame): load_clean_comments 返回的评论数据。
+        stopwords (set): 停用词集合。
+        sen_dict, neg_dict, adv_dict (dict): 情感词典、否定词词典、副词词典。
+        emoji_scores (dict): {emoji: 得分}。
+        segment_cache (SegmentationCache): 分词缓存，可选。
+
+    Returns:
+        DataFrame: 增加了 word_seg、t-score、t-z-score、e-score、e-z-score、senti-score、senti-z-score 列。
+    """
+    stages = [
+        ("seg", lambda: segment_comments(df, stopwords, cache=segment_cache)),
+        ("t-score", lambda: add_text_sentiment_scores(df, sen_dict, neg_dict, adv_dict)),
+        ("t-z-score", lambda: add_zscore(df, "t-score", "t-z-score")),
+        ("e-score", lambda: add_emoji_sentiment_scores(df, emoji_scores)),
+        ("e-z-score", lambda: add_zscore(df, "e-score", "e-z-score")),
+        ("senti-score", lambda: add_final_sentiment_scores(df)),
+        ("senti-z-score", lambda: add_zscore(df, "senti-score", "senti-z-score")),
+    ]
+    for name, stage in stages:
+        begin = time.perf_counter()
+        stage()
+        print(f"Preprocess stage {name}: {len(df)} rows in {time.perf_counter() - begin:.2f}s")
+    return df
+
+
+def seg_rmStpw(input_output_csv_path, stopwords_txt_path, workers=None):
+    """
+    使用jieba进行中文分词并去除停用词。
+
+    Args:
+        input_output_csv_path (str): 输入和输出使用同一个CSV文件的路径，该文件包含需要处理的评论。
+        stopwords_txt_path (str): 停用词列表的文本文件路径。
+        workers (int): 分词进程数，默认为 SEGMENT_WORKERS。
+    """
+    df = pd.read_csv(input_output_csv_path)
+    cache = open_segment_cache(stopwords_txt_path)
+    try:
+        segment_comments(df, load_stopwords(stopwords_txt_path), workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    df.to_csv(input_output_csv_path, index=False)
+
+
+def calculate_sentiment_score_and_normalize(
+    input_output_csv_path, sen_dict_path, neg_dict_path, adv_dict_path
+):
+    """
+    计算评论的情感分数，并根据提供的情感、否定词和副词词典进行加权。
+
+    Args:
+        input_output_csv_path (str): 输入和输出使用同一个CSV文件的路径，该文件包含已分词的评论。
+        sen_dict_path (str): 情感词典的文件路径。
+        neg_dict_path (str): 否定词词典的文件路径。
+        adv_dict_path (str): 副词词典的文件路径。
+    """
+    sen_dict, neg_dict, adv_dict = load_sentiment_dictionaries(sen_dict_path, neg_dict_path, adv_dict_path)
+    comments_df = pd.read_csv(input_output_csv_path)
+    add_text_sentiment_scores(comments_df, sen_dict, neg_dict, adv_dict)
     comments_df.to_csv(input_output_csv_path, index=False)
 
 
@@ -147,13 +345,8 @@ def t_normalize_sentiment_scores(file_path):
     Args:
         file_path (str): 包含情感分数的CSV文件路径。
     """
-    # 读取评论数据
     comments_df = pd.read_csv(file_path)
-
-    # 计算情感分数的Z-score
-    comments_df["t-z-score"] = zscore(comments_df["t-score"])
-
-    # 保存更新后的DataFrame到原文件
+    add_zscore(comments_df, "t-score", "t-z-score")
     comments_df.to_csv(file_path, index=False)
 
 
@@ -165,38 +358,9 @@ def calculate_emoji_sentiment_scores(comments_file_path, emoji_data_path):
         comments_file_path (str): 包含评论数据的CSV文件路径。
         emoji_data_path (str): 包含emoji情感得分的数据文件路径。
     """
-    # 加载emoji情感得分数据
-    emoji_df = pd.read_csv(emoji_data_path)
-    emoji_scores = {}
-    for _, row in emoji_df.iterrows():
-        total = row["Negative"] + row["Neutral"] + row["Positive"]
-        # 计算综合情感得分
-        score = (
-            (1 * row["Positive"] / total)
-            - (1.2 * row["Negative"] / total)
-            + (0.5 * row["Neutral"] / total)
-        )
-        emoji_scores[row["Emoji"]] = score
-
-    # 读取评论数据
+    emoji_scores = load_emoji_scores(emoji_data_path)
     comments_df = pd.read_csv(comments_file_path)
-
-    # 确保word_seg列中的所有项都是字符串，并处理NaN值
-    comments_df["word_seg"] = comments_df["word_seg"].astype(str).fillna("")
-
-    # 定义计算emoji情感得分的函数
-    def emoji_sentiment_score(word_seg):
-        score = 0.0
-        words = word_seg.split()  # 现在word_seg已经保证是字符串类型
-        for word in words:
-            if word in emoji_scores:
-                score += emoji_scores[word]
-        return score
-
-    # 应用函数计算每条评论的emoji情感得分
-    comments_df["e-score"] = comments_df["word_seg"].apply(emoji_sentiment_score)
-
-    # 将更新后的数据保存回原文件
+    add_emoji_sentiment_scores(comments_df, emoji_scores)
     comments_df.to_csv(comments_file_path, index=False)
 
 
@@ -207,15 +371,11 @@ def normalize_emoji_scores(file_path):
     Args:
         file_path (str): 包含emoji情感得分的CSV文件路径。
     """
-    # 读取评论数据
     comments_df = pd.read_csv(file_path)
 
     # 确保e-score列存在
     if "e-score" in comments_df.columns:
-        # 计算e-score的Z-score并添加为新列
-        comments_df["e-z-score"] = zscore(comments_df["e-score"])
-
-        # 将更新后的DataFrame保存回原文件
+        add_zscore(comments_df, "e-score", "e-z-score")
         comments_df.to_csv(file_path, index=False)
     else:
         print("The 'e-score' column does not exist in the DataFrame.")
@@ -228,28 +388,8 @@ def calculate_and_final_sentiment_score(file_path):
     Args:
         file_path (str): 包含已计算情感分数的CSV文件路径。
     """
-    # 读取评论数据
     comments_df = pd.read_csv(file_path)
-
-    # 定义计算最终情感分数的函数
-    def calculate_final_score(row):
-        t_z_score = row["t-z-score"]
-        e_z_score = row["e-z-score"]
-        # 当句子包含表情时，使用给定公式计算情感得分
-        if t_z_score >= 0 and e_z_score >= 0:
-            final_score = np.sqrt(0.7 * t_z_score + 0.3 * e_z_score)
-        elif t_z_score < 0 and e_z_score < 0:
-            final_score = 0.7 * t_z_score + 0.3 * e_z_score
-        else:
-            final_score = (t_z_score / e_z_score) * np.sqrt(
-                np.abs(0.7 * t_z_score + 0.3 * e_z_score)
-            )
-        return final_score
-
-    # 应用函数计算每条评论的最终情感得分
-    comments_df["senti-score"] = comments_df.apply(calculate_final_score, axis=1)
-
-    # 将更新后的数据保存回原文件
+    add_final_sentiment_scores(comments_df)
     comments_df.to_csv(file_path, index=False)
 
 
@@ -260,42 +400,134 @@ def normalize_senti_scores(file_path):
     Args:
         file_path (str): 包含最终情感得分的CSV文件路径。
     """
-    # 读取评论数据
     comments_df = pd.read_csv(file_path)
 
     # 确保senti-score列存在
     if "senti-score" in comments_df.columns:
-        # 计算senti-score的Z-score并添加为新列
-        comments_df["senti-z-score"] = zscore(comments_df["senti-score"])
-
-        # 将更新后的DataFrame保存回原文件
+        add_zscore(comments_df, "senti-score", "senti-z-score")
         comments_df.to_csv(file_path, index=False)
     else:
         print("The 'senti-score' column does not exist in the DataFrame.")
 
-def main():
-    # 确保输出目录存在
-    output_dir = f'{BASE_PATH}/comment_output'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
-    # 由原始数据文件经过长度清洗得到 并作为之后的主要数据处理文件
-    comments_file_path = f"{BASE_PATH}/comment_output/comments_cleaned.csv"
-    # 停用词词典的路径
-    stopwords_txt_path = f"{BASE_PATH}/stopwords.txt"
-    # 情感词典的路径
-    sen_dict_path = f"{BASE_PATH}/BosonNLP_sentiment_score.txt"
-    # 否定词词典的路径
-    neg_dict_path = f"{BASE_PATH}/NOT.txt"
-    # 副词词典的路径
-    adv_dict_path = f"{BASE_PATH}/adv_chinese.txt"
-    # Emoji数据的路径
-    emoji_data_path = f"{BASE_PATH}/emoji_data.csv"
 
+def run_pipeline(output_file_path, stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path):
+    """
+    流水线模式：读取数据库中的评论，在内存中完成全部预处理，只写一次结果文件。
+
+    Args:
+        output_file_path (str): 结果文件路径，通常为 comments_cleaned.parquet。
+        其余参数为各词典和emoji数据文件的路径，与逐步模式相同。
+    """
+    df = load_clean_comments()
+    cache = open_segment_cache(stopwords_txt_path)
+    try:
+        df = preprocess_comments(
+            df,
+            load_stopwords(stopwords_txt_path),
+            *load_sentiment_dictionaries(sen_dict_path, neg_dict_path, adv_dict_path),
+            load_emoji_scores(emoji_data_path),
+            segment_cache=cache,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    write_comments(df, output_file_path)
+    print(f"Preprocessed {len(df)} comments saved to {output_file_path}")
+
+
+def dictionaries_fingerprint(*paths):
+    """停用词、情感词典和emoji数据文件的摘要，任一文件变化时特征库需要重新计算"""
+    return "-".join(file_digest(path) for path in paths)
+
+
+def run_incremental(output_file_path, stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path,
+                    emoji_data_path):
+    """
+    增量模式：只对新增或修改的评论计算分词、t-score 和 e-score 并更新特征库，
+    已删除或被修改的评论先从特征库和累计统计量中移除。
+
+    t-z-score/e-z-score 使用特征库中累计的均值和标准差；senti-score 依赖所有评论的
+    t-z-score/e-z-score，随统计量变化，senti-score 及其Z-score 对全部评论在内存中重新计算（均为向量运算）。
+    最后和流水线模式一样写出完整的预处理结果。
+    """
+    store = FeatureStore(
+        FEATURE_STORE_PATH,
+        dictionaries_fingerprint(stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path),
+    )
+    features, state = store.load()
+    t_stats = RunningStats.from_dict(state["stats"]["t-score"])
+    e_stats = RunningStats.from_dict(state["stats"]["e-score"])
+
+    # 上次被 filter_comments 过滤掉的 id：不在特征库中，但已经处理过
+    filtered_ids = set(state.get("filtered_ids", []))
+
+    engine = create_engine(DB_URI)
+    try:
+        # 只读取 id 列，用于找出已删除的评论
+        ids = pd.read_sql("SELECT id FROM dataset", engine)["id"]
+        changed = load_changed_comments(engine, state["max_id"], state["max_create_time"])
+        # 并发写入时，较晚提交的行可能 id 小于 max_id 且 create_time 早于 max_create_time，
+        # 高水位读不到；表中存在、但既不在特征库中也没有被过滤过的 id 同样按新增处理
+        missing = ids[~ids.isin(features["id"]) & ~ids.isin(changed["id"]) & ~ids.isin(filtered_ids)]
+        if len(missing):
+            changed = pd.concat([changed, load_comments_by_id(engine, missing)], ignore_index=True)
+    finally:
+        engine.dispose()
+
+    # 已删除和被修改的评论从特征库中移除，被修改的评论和新增评论一起重新计算
+    stale = ~features["id"].isin(ids) | features["id"].isin(changed["id"])
+    t_stats.remove(features.loc[stale, "t-score"])
+    e_stats.remove(features.loc[stale, "e-score"])
+    features = features[~stale]
+
+    frames = [features] if len(features) else []
+    new = filter_comments(changed)
+    if len(new):
+        cache = open_segment_cache(stopwords_txt_path)
+        try:
+            segment_comments(new, load_stopwords(stopwords_txt_path), cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+        add_text_sentiment_scores(new, *load_sentiment_dictionaries(sen_dict_path, neg_dict_path, adv_dict_path))
+        add_emoji_sentiment_scores(new, load_emoji_scores(emoji_data_path))
+        t_stats.update(new["t-score"])
+        e_stats.update(new["e-score"])
+        frames.append(new[FEATURE_COLUMNS])
+    if frames:
+        features = pd.concat(frames, ignore_index=True).sort_values("id", ignore_index=True)
+
+    if len(changed):
+        state["max_id"] = max(state["max_id"], int(changed["id"].max()))
+        max_create_time = changed["create_time"].max()
+        if pd.notna(max_create_time):
+            state["max_create_time"] = max(state["max_create_time"] or 0, int(max_create_time))
+    state["stats"] = {"t-score": t_stats.to_dict(), "e-score": e_stats.to_dict()}
+    # 已删除的行不再记录；被修改的行按这次的过滤结果重新记录
+    filtered_ids = (filtered_ids & set(ids.tolist())) - set(changed["id"].tolist())
+    filtered_ids |= set(changed["id"].tolist()) - set(new["id"].tolist())
+    state["filtered_ids"] = sorted(int(i) for i in filtered_ids)
+    store.save(features, state)
+    print(
+        f"Feature store: {len(new)} new or changed comments processed, {int(stale.sum())} removed, "
+        f"{len(features)} total"
+    )
+
+    df = features.copy()
+    df["t-z-score"] = t_stats.zscore(df["t-score"])
+    df["e-z-score"] = e_stats.zscore(df["e-score"])
+    add_final_sentiment_scores(df)
+    add_zscore(df, "senti-score", "senti-z-score")
+    write_comments(df, output_file_path)
+    print(f"Preprocessed {len(df)} comments saved to {output_file_path}")
+
+
+def run_steps(comments_file_path, stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path):
+    """逐步模式：每个步骤读取并重写同一个CSV文件"""
     # 清理评论数据，仅保留长度在特定范围内的评论
     get_clean_comments(comments_file_path)
 
- # 检查文件是否生成
+    # 检查文件是否生成
     if os.path.exists(comments_file_path):
         print(f"{comments_file_path} has been created successfully.")
     else:
@@ -325,5 +557,41 @@ def main():
     normalize_senti_scores(comments_file_path)
 
 
+def main():
+    # 确保输出目录存在
+    output_dir = f'{BASE_PATH}/{COMMENTS_DIR}'
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # 停用词词典的路径
+    stopwords_txt_path = f"{BASE_PATH}/stopwords.txt"
+    # 情感词典的路径
+    sen_dict_path = f"{BASE_PATH}/BosonNLP_sentiment_score.txt"
+    # 否定词词典的路径
+    neg_dict_path = f"{BASE_PATH}/NOT.txt"
+    # 副词词典的路径
+    adv_dict_path = f"{BASE_PATH}/adv_chinese.txt"
+    # Emoji数据的路径
+    emoji_data_path = f"{BASE_PATH}/emoji_data.csv"
+
+    if PREPROCESS_INCREMENTAL:
+        run_incremental(
+            f"{output_dir}/{COMMENTS_PARQUET}",
+            stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path,
+        )
+    elif PREPROCESS_PIPELINE:
+        # 预处理结果只写一次，使用列式的 Parquet 格式，train_embed/train_svm 只读取需要的列
+        run_pipeline(
+            f"{output_dir}/{COMMENTS_PARQUET}",
+            stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path,
+        )
+    else:
+        # 由原始数据文件经过长度清洗得到 并作为之后的主要数据处理文件
+        run_steps(
+            f"{output_dir}/{COMMENTS_CSV}",
+            stopwords_txt_path, sen_dict_path, neg_dict_path, adv_dict_path, emoji_data_path,
+        )
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -10,11 +10,18 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics import confusion_matrix
 from sklearn.utils.multiclass import unique_labels 
 from joblib import dump
+import tempfile
 import time
 
 import mlflow
 import mlflow.sklearn
 
+import sys
+# 以 python -m src.train_svm 启动时，保证同目录下的模块可以直接导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from comment_store import comments_path, read_comments
+from compact_model import export_compact_model
 
 BASE_PATH = os.environ["BASE_PATH"]
 MODEL_NAME = os.environ["MODEL_NAME"]
@@ -25,7 +32,7 @@ mlflow.autolog()
 
 def load_data(file_path):
     """
-    从CSV文件中加载数据并进行预处理。
+    从预处理结果文件（Parquet 或 CSV）中加载数据并进行预处理。
 
     Args:
         file_path (str): 文件路径。
@@ -33,21 +40,24 @@ def load_data(file_path):
     Returns:
         X (sparse matrix): TF-IDF 特征矩阵。
         y (array): 目标标签数组。
+        tfidf_vectorizer (TfidfVectorizer): 拟合好的向量化器，导出推理格式时使用。
     """
-    df = pd.read_csv(file_path)
+    df = read_comments(file_path, columns=['reply', 'is_troll'])
     tfidf_vectorizer = TfidfVectorizer(max_features=5000)
     X = tfidf_vectorizer.fit_transform(df['reply'])
     y = df['is_troll'].values
-    return X, y
+    return X, y, tfidf_vectorizer
 
 
-def train_and_evaluate(X, y):
+def train_and_evaluate(X, y, vectorizer=None):
     """
     使用SVC训练模型并进行评估。
 
     Args:
         X: 特征数据。
         y: 标签数据。
+        vectorizer: 训练使用的向量化器，提供时额外把模型导出为紧凑推理格式，
+            记录在本次 run 的 compact 目录下。
     """
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
     parameters = {'kernel': ['linear', 'rbf'], 'C': [1, 10], 'gamma': ['scale', 'auto']}
@@ -74,11 +84,21 @@ def train_and_evaluate(X, y):
         })
         mlflow.sklearn.log_model(clf, "model")
 
+        # 导出不依赖 pickle 的推理格式（词表哈希、IDF、权重或支持向量），供 /predict 轻量加载。
+        # 导出失败不影响本次训练：/predict 找不到 compact 目录时会回退到上面的 pickle 模型
+        if vectorizer is not None:
+            try:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    export_compact_model(clf, vectorizer, tmp_dir)
+                    mlflow.log_artifacts(tmp_dir, "compact")
+            except Exception as e:
+                print(f"Warning: failed to export compact model, only the pickle model is logged: {e}")
+
 
 def main():
-    data_file_path = os.path.join(BASE_PATH, "comment_output/comments_cleaned.csv")
-    X, y = load_data(data_file_path)
-    train_and_evaluate(X, y)
+    data_file_path = comments_path(BASE_PATH)
+    X, y, vectorizer = load_data(data_file_path)
+    train_and_evaluate(X, y, vectorizer)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,138 @@
+import os
+import time
+import traceback
+from collections import deque
+from threading import Condition, Lock, Thread
+
+
+class WriteBehindWriter:
+    """
+    预测记录的异步批量写入（write-behind）。
+
+    请求线程调用 submit 把一行数据放入内存队列后立即返回，后台线程在攒满
+    flush_rows 行或最早的一行等待超过 flush_interval 秒时，把队列中的数据
+    交给 flush_fn 一次性写入。队列最多 max_queue 行，写满时 submit 最多阻塞
+    block_timeout 秒等待后台线程腾出空间（背压），仍然写不进去时返回 False，
+    由调用方改为同步写入。写入失败的批次会重试 retries 次，stop 会把剩余数据全部写完。
+
+    Args:
+        flush_fn (callable): flush_fn(rows) 写入一批数据，失败时抛出异常。
+        max_queue (int): 队列中最多保存的行数。
+        flush_rows (int): 攒满多少行立即写入。
+        flush_interval (float): 一行数据最多在队列中等待的时间（秒）。
+        block_timeout (float): 队列已满时 submit 最多等待的时间（秒）。
+        retries (int): 一批写入失败后的重试次数。
+    """
+
+    def __init__(self, flush_fn, max_queue=10000, flush_rows=500, flush_interval=0.05, block_timeout=1.0, retries=3):
+        self.flush_fn = flush_fn
+        self.max_queue = max_queue
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.retries = retries
+        self._queue = deque()  # [(row, enqueue_time)]
+        self._cond = Condition()
+        self._stopping = False
+        self._worker = None
+        self._worker_pid = None
+        self._stats_lock = Lock()
+        self._stats = {
+            "queued_rows": 0,
+            "written_rows": 0,
+            "failed_rows": 0,
+            "rejected_rows": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "flush_seconds_total": 0.0,
+            "blocked_seconds_total": 0.0,
+        }
+
+    def _ensure_worker(self):
+        # 与 MicroBatcher 相同：fork 出的子进程中没有父进程的线程，按进程启动后台线程
+        if self._worker_pid != os.getpid():
+            self._worker_pid = os.getpid()
+            self._stopping = False
+            self._worker = Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def submit(self, row):
+        """把一行数据放入队列，成功返回 True；队列持续写满或正在停止时返回 False"""
+        with self._cond:
+            if self._stopping:
+                return False
+            self._ensure_worker()
+            if len(self._queue) >= self.max_queue:
+                start = time.monotonic()
+                self._cond.wait_for(lambda: len(self._queue) < self.max_queue or self._stopping, self.block_timeout)
+                self._count(blocked_seconds_total=time.monotonic() - start)
+                if len(self._queue) >= self.max_queue or self._stopping:
+                    self._count(rejected_rows=1)
+                    return False
+            self._queue.append((row, time.monotonic()))
+            self._cond.notify_all()
+        self._count(queued_rows=1)
+        return True
+
+    def stop(self, timeout=None):
+        """停止接收新数据，等待后台线程把队列中的数据全部写完"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout)
+
+    def stats(self):
+        """返回写入行数、批次数、失败与背压统计以及当前队列长度"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._cond:
+            stats["pending_rows"] = len(self._queue)
+        stats["avg_flush_rows"] = stats["written_rows"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    def _next_batch(self):
+        """等待直到攒满一批、最早的一行到期或正在停止，返回要写入的行；停止且队列为空时返回 None"""
+        with self._cond:
+            while True:
+                if self._queue:
+                    expire = self._queue[0][1] + self.flush_interval
+                    now = time.monotonic()
+                    if len(self._queue) >= self.flush_rows or expire <= now or self._stopping:
+                        batch = [self._queue.popleft()[0] for _ in range(min(len(self._queue), self.flush_rows))]
+                        # 腾出空间，唤醒因队列已满而等待的请求
+                        self._cond.notify_all()
+                        return batch
+                    self._cond.wait(expire - now)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _flush(self, batch):
+        for attempt in range(self.retries + 1):
+            start = time.monotonic()
+            try:
+                self.flush_fn(batch)
+            except Exception:
+                traceback.print_exc()
+                self._count(flush_errors=1)
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt * 0.1, 2.0))
+                continue
+            self._count(flushes=1, written_rows=len(batch), flush_seconds_total=time.monotonic() - start)
+            return
+        self._count(failed_rows=len(batch))
+        print(f"Dropped {len(batch)} prediction rows after {self.retries + 1} failed writes")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
@@ -0,0 +1,4 @@
+# gunicorn 入口：导入时完成预热，配合 preload_app 在 fork 之前加载好模型
+from dataset import app, warmup
+
+warmup()
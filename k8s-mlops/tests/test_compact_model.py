@@ -0,0 +1,66 @@
+"""
+compact_model 的测试：导出的 CompactModel 与 sklearn 的 TfidfVectorizer + SVC 对同一组文本打分一致。
+
+用法：
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import GridSearchCV
+from sklearn.svm import SVC
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from compact_model import CompactModel, export_compact_model
+
+TROLL_WORDS = ["就这", "不会吧", "急了", "典中典", "笑死", "绷不住", "懂的都懂"]
+PLAIN_WORDS = ["今天", "天气", "不错", "学习", "模型", "训练", "数据", "分享", "谢谢", "视频", "up主", "OK"]
+
+
+def generate_comments(rows, seed=42):
+    """与 word_seg 列相同的以空格分隔的分词结果，杠精评论中混入 TROLL_WORDS"""
+    rng = np.random.default_rng(seed)
+    texts, labels = [], []
+    for i in range(rows):
+        label = i % 2
+        words = list(rng.choice(PLAIN_WORDS, size=rng.integers(2, 8)))
+        if label:
+            words += list(rng.choice(TROLL_WORDS, size=rng.integers(1, 3)))
+        # 少量噪声，避免训练集线性可分，rbf 核会保留较多支持向量
+        if rng.random() < 0.1:
+            words.append(rng.choice(TROLL_WORDS if not label else PLAIN_WORDS))
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+        labels.append(label)
+    return texts, np.array(labels)
+
+
+@pytest.mark.parametrize("make_estimator", [
+    lambda: SVC(kernel="linear", class_weight="balanced"),
+    lambda: SVC(kernel="rbf", class_weight="balanced", gamma="scale"),
+    lambda: SVC(kernel="rbf", C=10, gamma="auto"),
+    # train_svm 中使用的方式，导出 best_estimator_
+    lambda: GridSearchCV(SVC(class_weight="balanced"), {"kernel": ["linear", "rbf"], "C": [1, 10]}, cv=3),
+], ids=["linear", "rbf-scale", "rbf-auto", "grid-search"])
+def test_compact_model_matches_sklearn(tmp_path, make_estimator):
+    train_texts, train_labels = generate_comments(300)
+    vectorizer = TfidfVectorizer(max_features=5000)
+    estimator = make_estimator().fit(vectorizer.fit_transform(train_texts), train_labels)
+    export_compact_model(estimator, vectorizer, str(tmp_path))
+    model = CompactModel(str(tmp_path))
+
+    # 训练时没有见过的文本，以及含未登录词、单字符词和空文本的边界情况
+    texts, _ = generate_comments(200, seed=7)
+    texts += ["", "完全 没有 出现 过 的 词", "就这 就这 就这", "OK ok Ok", "a b c"]
+    expected = vectorizer.transform(texts)
+    best = getattr(estimator, "best_estimator_", estimator)
+
+    X = model.transform(texts)
+    assert np.allclose(X.toarray(), expected.toarray())
+    assert np.allclose(model.decision_function(texts), best.decision_function(expected))
+    assert np.allclose(model.decision_function_transformed(expected), best.decision_function(expected))
+    assert model.predict(texts).tolist() == estimator.predict(expected).tolist()
+    assert model.predict_transformed(X).tolist() == estimator.predict(expected).tolist()
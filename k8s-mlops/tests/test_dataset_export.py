@@ -0,0 +1,36 @@
+"""
+dataset_export 的测试：label 为 INTEGER 列的 dataset 表也能完整导出为 Parquet。
+
+用法：
+    python -m pytest tests
+"""
+import io
+import os
+import sqlite3
+import sys
+
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from dataset_export import EXPORT_COLUMNS, encode_rows
+
+
+def test_parquet_export_with_integer_label_column():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE dataset (id INTEGER PRIMARY KEY, text TEXT NOT NULL, label INTEGER, "
+        "source INTEGER, create_time BIGINT)"
+    )
+    conn.executemany(
+        "INSERT INTO dataset (text, label, source, create_time) VALUES (?, ?, 0, ?)",
+        [(f"评论{i}", None if i == 4 else i % 2, 1700000000 + i) for i in range(5)],
+    )
+    cursor = conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM dataset ORDER BY id")
+    # 分两个 row group 导出，第二个分块中的 INTEGER 值同样需要转换
+    chunks = iter(lambda: cursor.fetchmany(3), [])
+
+    table = pq.read_table(io.BytesIO(b"".join(encode_rows(chunks, "parquet"))))
+
+    assert table.num_rows == 5
+    assert table.column("label").to_pylist() == ["0", "1", "0", "1", None]
+    assert table.column("id").to_pylist() == [1, 2, 3, 4, 5]